@@ -1,25 +1,36 @@
 """FastAPI server for hackathon AI assistant with authentication and file uploads."""
 import asyncio
+import io
 import logging
 import uuid
 from contextlib import asynccontextmanager
 from typing import Optional, List
 
-from fastapi import FastAPI, HTTPException, Depends, Header, UploadFile, File, Form
+from fastapi import FastAPI, HTTPException, Depends, Header, Request, UploadFile, File, Form
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
 
 from core.agent import agent
+from core.llm_client import llm_client
+from core.memory import memory
 from core.rag import rag
 from core.auth import auth
 from core.file_processor import file_processor
+from core.tools import tools
 from core.config import config
+from core.redis_pool import close_redis
 
 # Configure logging
 logging.basicConfig(level=config.log_level)
 logger = logging.getLogger(__name__)
 
+# Server-Sent Events framing
+SSE_PREFIX = b"data: "
+SSE_LINE_SEP = b"\ndata: "  # Multi-line chunks need one data: field per line
+SSE_SUFFIX = b"\n\n"
+SSE_DONE = b"data: [DONE]\n\n"
+
 # Request models
 class RegisterRequest(BaseModel):
     username: str
@@ -32,22 +43,23 @@ class LoginRequest(BaseModel):
 class ChatRequest(BaseModel):
     message: str
     stream: bool = False
-    file_context: bool = True  # Include file context in response
 
 class DocumentRequest(BaseModel):
     content: str
     metadata: Optional[dict] = None
 
 # Dependency to get current user
+BEARER_PREFIX = "Bearer "
+
 async def get_current_user(authorization: Optional[str] = Header(None)):
     """Get current user from session token."""
     if not authorization:
         raise HTTPException(status_code=401, detail="No authorization header")
     
-    if not authorization.startswith("Bearer "):
+    session_id = authorization.removeprefix(BEARER_PREFIX)
+    if len(session_id) == len(authorization):
         raise HTTPException(status_code=401, detail="Invalid authorization format")
     
-    session_id = authorization.replace("Bearer ", "")
     user = await auth.get_user_from_session(session_id)
     
     if not user:
@@ -55,15 +67,21 @@ async def get_current_user(authorization: Optional[str] = Header(None)):
     
     return user
 
+# Shared dependency marker reused by every authenticated endpoint
+CurrentUser = Depends(get_current_user)
+
 # Startup/shutdown
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Handle startup and shutdown."""
     logger.info("🚀 AI Assistant starting up...")
     
-    # Initialize components
+    # Initialize components - Redis clients connect once here, not per request
     await asyncio.gather(
         agent.get_status(),  # Warm up agent
+        llm_client.ensure_ready(),
+        memory.ensure_ready(),
+        file_processor.ensure_ready(),
         return_exceptions=True
     )
     
@@ -71,24 +89,37 @@ async def lifespan(app: FastAPI):
     yield
     
     logger.info("🛑 AI Assistant shutting down...")
+    await agent.flush_pending_writes()
+    await tools.aclose()
+    await close_redis()
 
 # Create app
 app = FastAPI(
     title="Hackathon AI Assistant",
     description="Fast, reliable AI assistant with tools, RAG, and memory",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
-# CORS for frontend
+# CORS for frontend - explicit lists keep the middleware off its wildcard path
+ALLOWED_METHODS = ["GET", "POST"]
+ALLOWED_HEADERS = ["authorization", "content-type"]
+
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],  # Configure for production
+    allow_origins=config.cors_origins,  # Set CORS_ORIGINS for production
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=ALLOWED_METHODS,
+    allow_headers=ALLOWED_HEADERS,
 )
 
+@app.exception_handler(Exception)
+async def unhandled_exception_handler(request: Request, exc: Exception):
+    """Return a generic 500 - the server logs the traceback, so only a summary line here."""
+    logger.error("Unhandled error on %s %s: %r", request.method, request.url.path, exc)
+    return ORJSONResponse({"detail": "Internal server error"}, status_code=500)
+
 @app.get("/")
 async def root():
     """Health check."""
@@ -102,151 +133,139 @@ async def get_status():
 @app.post("/register")
 async def register(request: RegisterRequest):
     """Register a new user."""
-    try:
-        result = await auth.register_user(request.username, request.password)
-        return result
-    except Exception as e:
-        logger.error(f"Registration error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    return await auth.register_user(request.username, request.password)
 
 @app.post("/login")
 async def login(request: LoginRequest):
     """Login user and get session token."""
-    try:
-        result = await auth.login_user(request.username, request.password)
-        if "error" in result:
-            raise HTTPException(status_code=401, detail=result["error"])
-        return result
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Login error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    result = await auth.login_user(request.username, request.password)
+    if "error" in result:
+        raise HTTPException(status_code=401, detail=result["error"])
+    return result
 
 @app.post("/logout")
-async def logout(current_user: dict = Depends(get_current_user)):
+async def logout(current_user: dict = CurrentUser):
     """Logout user and destroy session."""
-    try:
-        result = await auth.logout_user(current_user["session_id"])
-        return result
-    except Exception as e:
-        logger.error(f"Logout error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    return await auth.logout_user(current_user["session_id"])
 
 @app.post("/chat")
-async def chat(request: ChatRequest, current_user: dict = Depends(get_current_user)):
+async def chat(request: ChatRequest, current_user: dict = CurrentUser):
     """Main chat endpoint."""
-    try:
-        user_id = current_user["user_id"]
+    user_id = current_user["user_id"]
+    
+    if request.stream:
+        # Streaming response (Server-Sent Events)
+        async def generate():
+            async for chunk in agent.stream_response(request.message, user_id):
+                yield SSE_PREFIX + SSE_LINE_SEP.join(chunk.encode().split(b"\n")) + SSE_SUFFIX
+            yield SSE_DONE
         
-        if request.stream:
-            # Streaming response
-            async def generate():
-                async for chunk in agent.stream_response(request.message, user_id):
-                    yield f"data: {chunk}\n\n"
-                yield "data: [DONE]\n\n"
-            
-            return StreamingResponse(
-                generate(),
-                media_type="text/plain",
-                headers={"X-User-ID": user_id}
-            )
-        else:
-            # Regular response
-            response = await agent.process_message(request.message, user_id)
-            return response
-            
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Chat error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+        return StreamingResponse(
+            generate(),
+            media_type="text/event-stream",
+            headers={"X-User-ID": user_id}
+        )
+    
+    # Regular response
+    return await agent.process_message(request.message, user_id)
 
 @app.post("/documents")
-async def add_document(request: DocumentRequest, current_user: dict = Depends(get_current_user)):
+async def add_document(request: DocumentRequest, current_user: dict = CurrentUser):
     """Add document to knowledge base."""
-    try:
-        success = await rag.add_document(request.content, request.metadata)
-        if success:
-            return {"status": "added", "message": "Document added to knowledge base"}
-        else:
-            raise HTTPException(status_code=500, detail="Failed to add document")
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Document add error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    success = await rag.add_document(request.content, request.metadata)
+    if not success:
+        raise HTTPException(status_code=500, detail="Failed to add document")
+    return {"status": "added", "message": "Document added to knowledge base"}
 
 @app.get("/documents/search")
-async def search_documents(query: str, limit: int = 3, current_user: dict = Depends(get_current_user)):
+async def search_documents(query: str, limit: int = 3, current_user: dict = CurrentUser):
     """Search knowledge base."""
-    try:
-        results = await rag.query(query, limit)
-        return {"results": results}
-    except Exception as e:
-        logger.error(f"Document search error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    results = await rag.query(query, limit)
+    return {"results": results}
+
+async def _enforce_upload_size(content_length: Optional[int] = Header(None)):
+    """Reject requests whose declared total size exceeds the limit."""
+    if content_length is not None and content_length > config.max_upload_bytes:
+        raise HTTPException(status_code=413, detail="Upload too large")
+
+def _upload_size(file: UploadFile) -> int:
+    """Size of a parsed upload - Starlette records it while spooling the part."""
+    if file.size is not None:
+        return file.size
+    file.file.seek(0, io.SEEK_END)
+    return file.file.tell()
+
+async def _handle_one(file: UploadFile, size: int) -> dict:
+    """Process an upload straight from Starlette's spooled temp file."""
+    file.file.seek(0)
+    result = await file_processor.process_file(
+        file.file, 
+        file.filename, 
+        file.content_type or ""
+    )
+    
+    return {
+        "filename": file.filename,
+        "type": result.get("type", "unknown"),
+        "file_id": result.get("file_id"),
+        "status": "success" if not result.get("error") else "error",
+        "error": result.get("error"),
+        "size": size
+    }
 
-@app.post("/upload")
+@app.post("/upload", dependencies=[Depends(_enforce_upload_size)])
 async def upload_files(
     files: List[UploadFile] = File(...),
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = CurrentUser
 ):
-    """Upload and process multiple files."""
-    try:
-        processed_files = []
-        
-        for file in files:
-            # Read file content
-            content = await file.read()
-            
-            # Process file
-            result = await file_processor.process_file(
-                content, 
-                file.filename, 
-                file.content_type or ""
-            )
-            
-            processed_files.append({
+    """Upload and process multiple files concurrently."""
+    # max_upload_bytes caps the whole request, matching the Content-Length check
+    sizes = [_upload_size(file) for file in files]
+    if sum(sizes) > config.max_upload_bytes:
+        raise HTTPException(status_code=413, detail="Upload too large")
+    
+    results = await asyncio.gather(
+        *[_handle_one(file, size) for file, size in zip(files, sizes)],
+        return_exceptions=True
+    )
+    
+    processed_files = []
+    for file, result in zip(files, results):
+        if isinstance(result, Exception):
+            logger.error(f"File upload error for {file.filename}: {result}")
+            result = {
                 "filename": file.filename,
-                "type": result.get("type", "unknown"),
-                "file_id": result.get("file_id"),
-                "status": "success" if not result.get("error") else "error",
-                "error": result.get("error"),
-                "size": len(content)
-            })
-        
-        return {
-            "files": processed_files,
-            "message": f"{len(processed_files)} file(s) uploaded successfully"
-        }
-        
-    except Exception as e:
-        logger.error(f"File upload error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+                "type": "unknown",
+                "file_id": None,
+                "status": "error",
+                "error": str(result),
+                "size": 0
+            }
+        processed_files.append(result)
+    
+    return {
+        "files": processed_files,
+        "message": f"{len(processed_files)} file(s) uploaded successfully"
+    }
 
 @app.get("/files")
-async def get_uploaded_files(current_user: dict = Depends(get_current_user)):
+async def get_uploaded_files(current_user: dict = CurrentUser):
     """Get list of uploaded files."""
-    try:
-        files = file_processor.get_file_context(current_user["user_id"])
-        return {
-            "files": [
-                {
-                    "filename": f.get("filename"),
-                    "type": f.get("type"),
-                    "file_id": f.get("file_id"),
-                    "processed_at": f.get("processed_at")
-                }
-                for f in files
-            ]
-        }
-    except Exception as e:
-        logger.error(f"Get files error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    files = file_processor.get_file_context(current_user["user_id"])
+    return {
+        "files": [
+            {
+                "filename": f.get("filename"),
+                "type": f.get("type"),
+                "file_id": f.get("file_id"),
+                "processed_at": f.get("processed_at")
+            }
+            for f in files
+        ]
+    }
 
 @app.get("/me")
-async def get_current_user_info(current_user: dict = Depends(get_current_user)):
+async def get_current_user_info(current_user: dict = CurrentUser):
     """Get current user information."""
     return {
         "user_id": current_user["user_id"],
@@ -255,10 +274,14 @@ async def get_current_user_info(current_user: dict = Depends(get_current_user)):
 
 if __name__ == "__main__":
     import uvicorn
+    # reload forces a single worker - only enable it via DEBUG in development
     uvicorn.run(
         "api.main:app",
         host="0.0.0.0",
         port=8000,
-        reload=True,
+        workers=config.web_concurrency,
+        loop="uvloop",
+        http="httptools",
+        reload=config.debug,
         log_level=config.log_level.lower()
     )
\ No newline at end of file
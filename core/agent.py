@@ -1,39 +1,85 @@
 """Core AI agent with optimized workflow."""
 import asyncio
+import functools
 import logging
-from typing import Dict, List, Optional, AsyncGenerator
-from datetime import datetime
+import re
+import time
+from typing import Dict, List, AsyncGenerator
 
 from .llm_client import llm_client
 from .memory import memory
 from .rag import rag
 from .tools import tools
-from .file_processor import file_processor
-from .config import config
 from .intent_classifier import intent_classifier
 from .prompt_templates import response_templates
 from .response_validator import response_validator
 from .hard_enforcer import hard_enforcer
 
+try:
+    from config.competition_config import USE_COMPETITION_PROMPT, COMPETITION_PROMPT_FILE, SYSTEM_PROMPT_FILE
+except ImportError:
+    USE_COMPETITION_PROMPT = False
+    SYSTEM_PROMPT_FILE = "prompts/system_prompt.txt"
+    COMPETITION_PROMPT_FILE = "prompts/competition_prompt.txt"
+
 logger = logging.getLogger(__name__)
 
-class AIAgent:
-    def __init__(self):
-        self.system_prompt = self._build_system_prompt()
-    
-    def _build_system_prompt(self) -> str:
-        """Build system prompt from file."""
-        try:
-            # Try to load competition prompt first
-            from config.competition_config import USE_COMPETITION_PROMPT, COMPETITION_PROMPT_FILE, SYSTEM_PROMPT_FILE
-            
-            prompt_file = COMPETITION_PROMPT_FILE if USE_COMPETITION_PROMPT else SYSTEM_PROMPT_FILE
-            
-            with open(prompt_file, 'r') as f:
-                return f.read()
-        except Exception as e:
-            # Fallback to default prompt
-            return """You are a helpful AI assistant optimized for speed and accuracy.
+# Health/stress/workload mentions that force ORGANIZE mode (substring match)
+_ORGANIZE_OVERRIDE_RE = re.compile(r"health|stress|overwhelmed|anxiety|college|side hustle")
+
+# Guaranteed-clean replies when the LLM fails or drifts
+_FALLBACKS = {
+    "DECIDE": """**Decision:** Need specific options
+
+**Recommendation:** Provide clear choices
+
+**Reason:**
+• Cannot decide without alternatives
+• Need exact options
+
+**Do this today:** List the options you're choosing between.""",
+    "PLAN": """**Goal:** Unclear objective
+
+**Steps:**
+1. Define specific goal
+2. Set deadline
+3. List requirements
+4. Create timeline
+5. Start first task
+
+**Do this today:** State exactly what you want to achieve.""",
+}
+CHAT_FALLBACK = "Batao."
+
+# Strong references so pending background writes aren't garbage-collected
+_BG_TASKS: set = set()
+
+def _save_turn(user_id: str, user_message: str, reply: str) -> None:
+    """Persist a user/assistant turn off the response critical path."""
+    task = asyncio.create_task(
+        memory.add_messages(user_id, [("user", user_message), ("assistant", reply)])
+    )
+    _BG_TASKS.add(task)
+    task.add_done_callback(_BG_TASKS.discard)
+
+@functools.lru_cache(maxsize=4)
+def _system_content(intent: str) -> str:
+    """Build the system message for an intent - static, so built once per intent."""
+    student_context = hard_enforcer.get_student_context()
+    system_prompt = response_templates.get_system_prompt(intent)
+    return f"{student_context}\n\n{system_prompt}"
+
+def _load_system_prompt() -> str:
+    """Load system prompt from file."""
+    try:
+        # Try to load competition prompt first
+        prompt_file = COMPETITION_PROMPT_FILE if USE_COMPETITION_PROMPT else SYSTEM_PROMPT_FILE
+        
+        with open(prompt_file, 'r') as f:
+            return f.read()
+    except Exception as e:
+        # Fallback to default prompt
+        return """You are a helpful AI assistant optimized for speed and accuracy.
 
 Key behaviors:
 - Be concise but complete
@@ -51,51 +97,69 @@ Available tools:
 - get_time: Get current date and time
 
 Always provide a helpful response even if tools fail."""
-    
-    async def _prepare_messages(self, user_message: str, user_id: str, intent: str) -> List[Dict]:
-        """Legacy method - redirects to strict version."""
-        return await self._prepare_messages_strict(user_message, user_id, intent)
 
-    
+# Read once at import and shared by every agent instance
+_SYSTEM_PROMPT_TEMPLATE = _load_system_prompt()
 
+class AIAgent:
+    # Last formatted UTC timestamp, refreshed at most once per second
+    _ts_sec: int = 0
+    _ts_str: str = ""
+    
+    def __init__(self):
+        self.system_prompt = _SYSTEM_PROMPT_TEMPLATE
+    
+    @classmethod
+    def _now_str(cls) -> str:
+        """Current UTC time as ISO-8601 at one-second resolution."""
+        now = int(time.time())
+        if now != cls._ts_sec:
+            cls._ts_sec = now
+            cls._ts_str = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(now))
+        return cls._ts_str
+    
     async def process_message(self, user_message: str, user_id: str) -> Dict:
         """Process user message with ULTRA-STRICT enforcement."""
-        start_time = asyncio.get_event_loop().time()
+        loop = asyncio.get_running_loop()
+        start_time = loop.time()
+        
+        # Bind hot-path methods once per call
+        classify = intent_classifier.classify
+        handle_chat = hard_enforcer.handle_chat_mode
+        has_banned = hard_enforcer.has_banned_content
+        ultra_validate = response_validator.ultra_strict_validate
+        fix_decide = hard_enforcer.fix_decide_response
+        fix_org = hard_enforcer.fix_organize_response
+        
+        # Classify once - the error path below reuses it
+        intent = classify(user_message)
         
         try:
             # STEP 1: HARD CHAT MODE OVERRIDE - NO LLM
-            intent = intent_classifier.classify(user_message)
-            
             if intent == "CHAT":
-                chat_response = hard_enforcer.handle_chat_mode(user_message)
+                chat_response = handle_chat(user_message)
                 
-                await memory.add_message(user_id, "user", user_message)
-                await memory.add_message(user_id, "assistant", chat_response)
+                _save_turn(user_id, user_message, chat_response)
                 
                 return {
                     "content": chat_response,
                     "user_id": user_id,
-                    "duration": round(asyncio.get_event_loop().time() - start_time, 3),
+                    "duration": round(loop.time() - start_time, 3),
                     "tool_calls_made": 0,
                     "status": "success",
                     "intent": "CHAT"
                 }
             
             # STEP 2: ORGANIZE MODE - HARD OVERRIDE for health/stress mentions
-            if intent == "ORGANIZE" or any(word in user_message.lower() for word in ["health", "stress", "overwhelmed", "anxiety", "college", "side hustle"]):
-                # Force ORGANIZE intent if health/stress mentioned
-                if intent == "CHAT" and any(word in user_message.lower() for word in ["college", "side hustle", "family work", "responsibilities"]):
-                    intent = "ORGANIZE"
+            if intent == "ORGANIZE" or _ORGANIZE_OVERRIDE_RE.search(user_message.lower()):
+                organize_response = fix_org(user_message)
                 
-                organize_response = hard_enforcer.fix_organize_response(user_message)
-                
-                await memory.add_message(user_id, "user", user_message)
-                await memory.add_message(user_id, "assistant", organize_response)
+                _save_turn(user_id, user_message, organize_response)
                 
                 return {
                     "content": organize_response,
                     "user_id": user_id,
-                    "duration": round(asyncio.get_event_loop().time() - start_time, 3),
+                    "duration": round(loop.time() - start_time, 3),
                     "tool_calls_made": 0,
                     "status": "success",
                     "intent": "ORGANIZE"
@@ -108,33 +172,29 @@ Always provide a helpful response even if tools fail."""
             response = await llm_client.complete(messages)
             
             # STEP 4: ULTRA-STRICT validation
-            if response.get("content"):
+            content = response.content or ""
+            if content:
                 # Check for banned content first
-                if hard_enforcer.has_banned_content(response["content"]):
-                    response["content"] = self._get_clean_fallback(intent, user_message)
+                if has_banned(content):
+                    content = self._get_clean_fallback(intent, user_message)
                 else:
-                    response["content"] = response_validator.ultra_strict_validate(
-                        response["content"], intent
-                    )
+                    content = ultra_validate(content, intent)
                     
                     # Fix DECIDE responses (remove Options section)
                     if intent == "DECIDE":
-                        response["content"] = hard_enforcer.fix_decide_response(response["content"])
-            
-            # STEP 5: Final safety check
-            if hard_enforcer.has_banned_content(response.get("content", "")):
-                response["content"] = self._get_clean_fallback(intent, user_message)
+                        content = fix_decide(content)
+                    
+                    # STEP 5: Final safety check on the rewritten text
+                    if has_banned(content):
+                        content = self._get_clean_fallback(intent, user_message)
             
-            # Save to memory
-            await asyncio.gather(
-                memory.add_message(user_id, "user", user_message),
-                memory.add_message(user_id, "assistant", response["content"])
-            )
+            # Save to memory in the background
+            _save_turn(user_id, user_message, content)
             
-            duration = asyncio.get_event_loop().time() - start_time
+            duration = loop.time() - start_time
             
             return {
-                "content": response["content"],
+                "content": content,
                 "user_id": user_id,
                 "duration": round(duration, 3),
                 "tool_calls_made": 0,
@@ -146,16 +206,11 @@ Always provide a helpful response even if tools fail."""
             logger.error(f"Agent processing error: {e}")
             
             # Clean fallback
-            intent = intent_classifier.classify(user_message)
             fallback = self._get_clean_fallback(intent, user_message)
             
-            try:
-                await memory.add_message(user_id, "user", user_message)
-                await memory.add_message(user_id, "assistant", fallback)
-            except:
-                pass
+            _save_turn(user_id, user_message, fallback)
             
-            duration = asyncio.get_event_loop().time() - start_time
+            duration = loop.time() - start_time
             
             return {
                 "content": fallback,
@@ -168,64 +223,20 @@ Always provide a helpful response even if tools fail."""
     
     async def _prepare_messages_strict(self, user_message: str, user_id: str, intent: str) -> List[Dict]:
         """Prepare messages with ULTRA-STRICT context."""
-        # Initialize Redis connections if needed
-        if not llm_client.redis_client:
-            await llm_client._init_redis()
-        if not memory.redis_client:
-            await memory._init_redis()
-
-        messages = []
-        
-        # INJECT student context HARD
-        student_context = hard_enforcer.get_student_context()
-        system_prompt = response_templates.get_system_prompt(intent)
-        
-        messages.append({
-            "role": "system",
-            "content": f"{student_context}\n\n{system_prompt}"
-        })
-        
         # NO conversation history to prevent bloat
         # NO RAG context to prevent advice injection
-        
-        # Add current user message
-        messages.append({
-            "role": "user",
-            "content": user_message
-        })
-        
-        return messages
+        return [
+            # INJECT student context HARD
+            {"role": "system", "content": _system_content(intent)},
+            # Current user message
+            {"role": "user", "content": user_message}
+        ]
     
     def _get_clean_fallback(self, intent: str, user_input: str) -> str:
         """Get guaranteed clean fallback."""
-        if intent == "DECIDE":
-            return """**Decision:** Need specific options
-
-**Recommendation:** Provide clear choices
-
-**Reason:**
-• Cannot decide without alternatives
-• Need exact options
-
-**Do this today:** List the options you're choosing between."""
-        
-        elif intent == "PLAN":
-            return """**Goal:** Unclear objective
-
-**Steps:**
-1. Define specific goal
-2. Set deadline
-3. List requirements
-4. Create timeline
-5. Start first task
-
-**Do this today:** State exactly what you want to achieve."""
-        
-        elif intent == "ORGANIZE":
+        if intent == "ORGANIZE":
             return hard_enforcer.fix_organize_response(user_input)
-        
-        else:  # CHAT
-            return "Batao."
+        return _FALLBACKS.get(intent, CHAT_FALLBACK)
     
     async def stream_response(self, user_message: str, user_id: str) -> AsyncGenerator[str, None]:
         """Stream response with ULTRA-STRICT validation."""
@@ -236,42 +247,51 @@ Always provide a helpful response even if tools fail."""
             if intent == "CHAT":
                 chat_response = hard_enforcer.handle_chat_mode(user_message)
                 yield chat_response
+                
+                _save_turn(user_id, user_message, chat_response)
                 return
             
             # For other intents, use strict preparation
             messages = await self._prepare_messages_strict(user_message, user_id, intent)
             
-            # Stream response
-            response_content = ""
+            # Stream response - collect chunks and join once
+            parts = []
             async for chunk in llm_client.stream_complete(messages):
-                response_content += chunk
+                parts.append(chunk)
                 yield chunk
+            response_content = "".join(parts)
             
             # ULTRA-STRICT validation of streamed response
+            final_content = response_content
             if response_content:
                 if hard_enforcer.has_banned_content(response_content):
-                    yield f"\n\n[Clean response]\n{self._get_clean_fallback(intent, user_message)}"
+                    final_content = self._get_clean_fallback(intent, user_message)
+                    yield f"\n\n[Clean response]\n{final_content}"
                 else:
                     fixed_content = response_validator.ultra_strict_validate(response_content, intent)
                     if fixed_content != response_content:
+                        final_content = fixed_content
                         yield f"\n\n[Enforced structure]\n{fixed_content}"
             
-            # Save to memory
-            asyncio.create_task(
-                memory.add_message(user_id, "user", user_message)
-            )
+            # Save both turns to memory in one batched write
+            _save_turn(user_id, user_message, final_content)
             
         except Exception as e:
             logger.error(f"Streaming error: {e}")
             yield "Error. Be specific about what you need."
     
+    async def flush_pending_writes(self):
+        """Wait for background memory writes (used on shutdown)."""
+        if _BG_TASKS:
+            await asyncio.gather(*_BG_TASKS, return_exceptions=True)
+    
     async def get_status(self) -> Dict:
         """Get agent status and stats."""
         return {
             "status": "ready",
             "rag_stats": rag.get_stats(),
             "tools_available": len(tools.get_tool_definitions()),
-            "timestamp": datetime.utcnow().isoformat()
+            "timestamp": self._now_str()
         }
 
 # Global instance
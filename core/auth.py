@@ -1,173 +1,316 @@
 """User authentication and session management."""
+import asyncio
 import uuid
 import hashlib
-import json
+import hmac
 import logging
-from typing import Dict, Optional
-from datetime import datetime, timedelta
-import redis.asyncio as redis
+import time
+from typing import Dict, Optional, Tuple, Type, TypeVar, Union
+from datetime import datetime
+import msgspec
+from cachetools import LRUCache
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
 
 from .config import config
+from .redis_pool import get_redis
 
 logger = logging.getLogger(__name__)
 
-class UserAuth:
+# Validated sessions are cached briefly so repeat requests skip Redis
+SESSION_CACHE_TTL = 30  # seconds
+SESSION_CACHE_SIZE = 1024
+
+SESSION_LIFETIME = 24 * 3600  # seconds
+
+# While on the per-worker fallback, retry Redis this often - workers must not diverge for good
+STORE_RETRY_INTERVAL = 30  # seconds
+
+# Argon2id cost - 64 MiB like RFC 9106 low-memory (t=3, p=4), with fewer passes and lanes for login QPS
+ARGON2_TIME_COST = 2
+ARGON2_MEMORY_COST = 65536  # KiB
+ARGON2_PARALLELISM = 1
+
+# Users registered before Argon2 carry a bare SHA-256 hex digest
+LEGACY_HASH_LENGTH = 64
+
+class UserData(msgspec.Struct):
+    """Stored account record."""
+    user_id: str
+    username: str
+    password_hash: str
+    created_at: str
+    last_login: Optional[str] = None
+
+class SessionData(msgspec.Struct):
+    """Stored login session."""
+    session_id: str
+    user_id: str
+    username: str
+    login_time: str
+    expires_at: Union[float, str]  # Unix time; ISO string on sessions from older releases
+
+_Record = TypeVar("_Record", UserData, SessionData)
+
+_encoder = msgspec.msgpack.Encoder()
+
+def _decode(blob: bytes, record_type: Type[_Record]) -> _Record:
+    """Decode a stored record - msgpack, with JSON for entries written before the switch."""
+    if blob[:1] == b"{":
+        return msgspec.json.decode(blob, type=record_type)
+    return msgspec.msgpack.decode(blob, type=record_type)
+
+class InMemoryAuthStore:
+    """Worker-local storage, used only when Redis is unavailable."""
+    
     def __init__(self):
-        self.redis_client = None
-        self.sessions = {}  # Fallback in-memory storage
-        self.users = {}     # Fallback user storage
-        
-    async def _init_redis(self):
-        """Initialize Redis connection."""
-        if self.redis_client:
-            return
-            
+        self.users: Dict[str, UserData] = {}
+        self.sessions: Dict[str, SessionData] = {}
+    
+    async def get_user(self, username: str) -> Optional[UserData]:
+        """Get a user by username."""
+        return self.users.get(username)
+    
+    async def put_user(self, user: UserData):
+        """Store a user."""
+        self.users[user.username] = user
+    
+    async def get_session(self, session_id: str) -> Optional[SessionData]:
+        """Get a session by ID."""
+        return self.sessions.get(session_id)
+    
+    async def put_session(self, session: SessionData, user: Optional[UserData] = None):
+        """Store a session, and optionally its user."""
+        self.sessions[session.session_id] = session
+        if user:
+            self.users[user.username] = user
+    
+    async def delete_session(self, session_id: str):
+        """Delete a session."""
+        self.sessions.pop(session_id, None)
+
+class RedisAuthStore:
+    """Shared storage in Redis - the single source of truth across workers."""
+    
+    def __init__(self, client):
+        self.client = client
+    
+    async def get_user(self, username: str) -> Optional[UserData]:
+        """Get a user by username."""
         try:
-            self.redis_client = redis.from_url(config.redis_url)
-            await self.redis_client.ping()
-            logger.info("Auth Redis connected")
+            blob = await self.client.get(f"user:{username}")
+            return _decode(blob, UserData) if blob else None
         except Exception as e:
-            logger.warning(f"Auth Redis unavailable: {e}")
-            self.redis_client = None
+            logger.error(f"Failed to get user from Redis: {e}")
+            return None
+    
+    async def put_user(self, user: UserData):
+        """Store a user."""
+        try:
+            await self.client.setex(
+                f"user:{user.username}",
+                config.cache_ttl * 24 * 7,  # 1 week
+                _encoder.encode(user)
+            )
+        except Exception as e:
+            logger.error(f"Failed to store user in Redis: {e}")
+    
+    async def get_session(self, session_id: str) -> Optional[SessionData]:
+        """Get a session by ID."""
+        try:
+            blob = await self.client.get(f"session:{session_id}")
+            return _decode(blob, SessionData) if blob else None
+        except Exception as e:
+            logger.error(f"Failed to get session from Redis: {e}")
+            return None
+    
+    async def put_session(self, session: SessionData, user: Optional[UserData] = None):
+        """Store a session, and optionally its user, in one round trip."""
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            pipe.setex(
+                f"session:{session.session_id}",
+                config.cache_ttl * 24,  # 24 hours
+                _encoder.encode(session)
+            )
+            if user:
+                pipe.setex(
+                    f"user:{user.username}",
+                    config.cache_ttl * 24 * 7,  # 1 week
+                    _encoder.encode(user)
+                )
+            await pipe.execute()
+        except Exception as e:
+            logger.error(f"Failed to store session in Redis: {e}")
+    
+    async def delete_session(self, session_id: str):
+        """Delete a session."""
+        try:
+            await self.client.delete(f"session:{session_id}")
+        except Exception as e:
+            logger.error(f"Failed to delete session from Redis: {e}")
+
+AuthStore = Union[RedisAuthStore, InMemoryAuthStore]
+
+class UserAuth:
+    def __init__(self):
+        self._store: Optional[AuthStore] = None
+        self._store_lock = asyncio.Lock()
+        self._fallback_store: Optional[InMemoryAuthStore] = None
+        self._store_retry_at = 0.0
+        self._session_cache: LRUCache = LRUCache(maxsize=SESSION_CACHE_SIZE)  # session_id -> (deadline, user)
+        self._ph = PasswordHasher(
+            time_cost=ARGON2_TIME_COST,
+            memory_cost=ARGON2_MEMORY_COST,
+            parallelism=ARGON2_PARALLELISM
+        )
     
-    def _hash_password(self, password: str) -> str:
-        """Hash password for storage."""
-        return hashlib.sha256(password.encode()).hexdigest()
+    def _store_settled(self) -> bool:
+        """True when the current store needs no Redis retry yet."""
+        if isinstance(self._store, RedisAuthStore):
+            return True
+        return self._store is not None and time.monotonic() < self._store_retry_at
+    
+    async def _get_store(self) -> AuthStore:
+        """Use Redis when reachable; fall back to in-memory storage and retry Redis after a backoff."""
+        if self._store_settled():
+            return self._store
+        async with self._store_lock:
+            if self._store_settled():
+                return self._store
+            try:
+                client = get_redis()
+                await client.ping()
+                self._store = RedisAuthStore(client)
+                logger.info("Auth Redis connected")
+            except Exception as e:
+                logger.error(f"Auth Redis unavailable, using per-worker in-memory storage for {STORE_RETRY_INTERVAL}s: {e}")
+                if self._fallback_store is None:
+                    self._fallback_store = InMemoryAuthStore()
+                self._store = self._fallback_store
+                self._store_retry_at = time.monotonic() + STORE_RETRY_INTERVAL
+        return self._store
+    
+    async def _hash_password(self, password: str) -> str:
+        """Hash password with Argon2id off the event loop."""
+        return await asyncio.to_thread(self._ph.hash, password)
+    
+    def _verify_sync(self, password_hash: str, password: str) -> Tuple[bool, bool]:
+        """Verify a password; returns (valid, needs_rehash)."""
+        if len(password_hash) == LEGACY_HASH_LENGTH and not password_hash.startswith("$"):
+            legacy = hashlib.sha256(password.encode()).hexdigest()
+            return hmac.compare_digest(password_hash, legacy), True
+        try:
+            self._ph.verify(password_hash, password)
+        except (VerificationError, InvalidHashError):
+            return False, False
+        return True, self._ph.check_needs_rehash(password_hash)
+    
+    async def _verify_password(self, password_hash: str, password: str) -> Tuple[bool, bool]:
+        """Verify password off the event loop."""
+        return await asyncio.to_thread(self._verify_sync, password_hash, password)
     
     async def register_user(self, username: str, password: str) -> Dict:
         """Register a new user."""
-        await self._init_redis()
+        store = await self._get_store()
         
         user_id = str(uuid.uuid4())
-        user_data = {
-            "user_id": user_id,
-            "username": username,
-            "password_hash": self._hash_password(password),
-            "created_at": datetime.utcnow().isoformat(),
-            "last_login": None
-        }
-        
-        # Store user data
-        if self.redis_client:
-            try:
-                await self.redis_client.setex(
-                    f"user:{username}",
-                    config.cache_ttl * 24 * 7,  # 1 week
-                    json.dumps(user_data)
-                )
-            except Exception as e:
-                logger.error(f"Failed to store user in Redis: {e}")
+        user_data = UserData(
+            user_id=user_id,
+            username=username,
+            password_hash=await self._hash_password(password),
+            created_at=datetime.utcnow().isoformat()
+        )
         
-        # Always store in fallback memory
-        self.users[username] = user_data
+        await store.put_user(user_data)
         
         return {"user_id": user_id, "username": username, "status": "registered"}
     
     async def login_user(self, username: str, password: str) -> Dict:
         """Login user and create session."""
-        await self._init_redis()
-        
-        # Get user data
-        user_data = None
-        if self.redis_client:
-            try:
-                user_json = await self.redis_client.get(f"user:{username}")
-                if user_json:
-                    user_data = json.loads(user_json)
-            except Exception as e:
-                logger.error(f"Failed to get user from Redis: {e}")
-        
-        # Fallback to memory
-        if not user_data and username in self.users:
-            user_data = self.users[username]
+        store = await self._get_store()
         
+        user_data = await store.get_user(username)
         if not user_data:
             return {"error": "User not found"}
         
         # Verify password
-        if user_data["password_hash"] != self._hash_password(password):
+        valid, needs_rehash = await self._verify_password(user_data.password_hash, password)
+        if not valid:
             return {"error": "Invalid password"}
         
+        # Upgrade legacy SHA-256 or outdated Argon2 parameters
+        if needs_rehash:
+            user_data.password_hash = await self._hash_password(password)
+        
         # Create session
         session_id = str(uuid.uuid4())
-        session_data = {
-            "session_id": session_id,
-            "user_id": user_data["user_id"],
-            "username": username,
-            "login_time": datetime.utcnow().isoformat(),
-            "expires_at": (datetime.utcnow() + timedelta(hours=24)).isoformat()
-        }
-        
-        # Store session
-        if self.redis_client:
-            try:
-                await self.redis_client.setex(
-                    f"session:{session_id}",
-                    config.cache_ttl * 24,  # 24 hours
-                    json.dumps(session_data)
-                )
-            except Exception as e:
-                logger.error(f"Failed to store session in Redis: {e}")
-        
-        # Always store in fallback memory
-        self.sessions[session_id] = session_data
+        now_iso = datetime.utcnow().isoformat()
+        session_data = SessionData(
+            session_id=session_id,
+            user_id=user_data.user_id,
+            username=username,
+            login_time=now_iso,
+            expires_at=time.time() + SESSION_LIFETIME
+        )
         
         # Update last login
-        user_data["last_login"] = datetime.utcnow().isoformat()
-        self.users[username] = user_data
+        user_data.last_login = now_iso
+        
+        # Store session (and an upgraded hash) together
+        await store.put_session(session_data, user_data if needs_rehash else None)
         
         return {
             "session_id": session_id,
-            "user_id": user_data["user_id"],
+            "user_id": user_data.user_id,
             "username": username,
             "status": "logged_in"
         }
     
+    def _cache_session(self, session_id: str, user: Dict, ttl: float):
+        """Cache a validated session for at most ttl seconds."""
+        self._session_cache[session_id] = (time.monotonic() + ttl, user)
+    
     async def get_user_from_session(self, session_id: str) -> Optional[Dict]:
         """Get user data from session ID."""
-        await self._init_redis()
+        # Hot path - recently validated session
+        cached = self._session_cache.get(session_id)
+        if cached:
+            if cached[0] > time.monotonic():
+                return cached[1]
+            del self._session_cache[session_id]
         
-        # Get session data
-        session_data = None
-        if self.redis_client:
-            try:
-                session_json = await self.redis_client.get(f"session:{session_id}")
-                if session_json:
-                    session_data = json.loads(session_json)
-            except Exception as e:
-                logger.error(f"Failed to get session from Redis: {e}")
-        
-        # Fallback to memory
-        if not session_data and session_id in self.sessions:
-            session_data = self.sessions[session_id]
+        store = await self._get_store()
         
+        session_data = await store.get_session(session_id)
         if not session_data:
             return None
         
         # Check if session is expired
-        expires_at = datetime.fromisoformat(session_data["expires_at"])
-        if datetime.utcnow() > expires_at:
+        expires_at = session_data.expires_at
+        if isinstance(expires_at, str):
+            remaining = (datetime.fromisoformat(expires_at) - datetime.utcnow()).total_seconds()
+        else:
+            remaining = expires_at - time.time()
+        if remaining <= 0:
             return None
         
-        return {
-            "user_id": session_data["user_id"],
-            "username": session_data["username"],
+        user = {
+            "user_id": session_data.user_id,
+            "username": session_data.username,
             "session_id": session_id
         }
+        
+        # Never cache past the session's own expiry
+        self._cache_session(session_id, user, min(SESSION_CACHE_TTL, remaining))
+        
+        return user
     
     async def logout_user(self, session_id: str) -> Dict:
         """Logout user and destroy session."""
-        await self._init_redis()
-        
-        if self.redis_client:
-            try:
-                await self.redis_client.delete(f"session:{session_id}")
-            except Exception as e:
-                logger.error(f"Failed to delete session from Redis: {e}")
-        
-        # Remove from memory fallback
-        if session_id in self.sessions:
-            del self.sessions[session_id]
+        self._session_cache.pop(session_id, None)
+        store = await self._get_store()
+        await store.delete_session(session_id)
 
 # Global instance
 auth = UserAuth()
\ No newline at end of file
@@ -1,6 +1,6 @@
 """Configuration management for hackathon AI assistant."""
 import os
-from typing import Optional
+from typing import List, Optional
 from pydantic_settings import BaseSettings
 
 class Config(BaseSettings):
@@ -17,11 +17,23 @@ class Config(BaseSettings):
     # Cache
     redis_url: str = "redis://localhost:6379"
     cache_ttl: int = 3600  # 1 hour
+    redis_max_connections: int = 32  # Shared pool size per worker
     
     # RAG
     chroma_persist_dir: str = "./chroma_db"
     embedding_model: str = "all-MiniLM-L6-v2"  # Fast embeddings
     max_rag_results: int = 3
+    embedding_int8: bool = False  # Dynamic int8 quantization for CPU; embeddings shift slightly
+    
+    # Uploads
+    max_upload_bytes: int = 25 * 1024 * 1024  # 25 MB per upload request, all files combined
+    
+    # CORS
+    cors_origins: List[str] = ["http://localhost:3000"]  # React dev server
+    
+    # Server
+    debug: bool = False  # Enables auto-reload - keep off in production
+    web_concurrency: int = 1  # Uvicorn worker processes - >1 needs Redis, and /files stays per worker
     
     # Logging
     log_level: str = "INFO"
@@ -2,11 +2,13 @@
 import asyncio
 import logging
 import hashlib
-import json
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, BinaryIO, Tuple
 from datetime import datetime
 import base64
+import codecs
 import io
+import msgspec
+from cachetools import LRUCache
 
 # PDF processing
 try:
@@ -24,50 +26,138 @@ try:
 except ImportError:
     IMAGE_AVAILABLE = False
 
+# Encoding detection for non-UTF-8 text
+try:
+    from charset_normalizer import from_bytes
+    CHARSET_DETECTION_AVAILABLE = True
+except ImportError:
+    CHARSET_DETECTION_AVAILABLE = False
+
+# Fast content hashing
+try:
+    import blake3
+    BLAKE3_AVAILABLE = True
+except ImportError:
+    BLAKE3_AVAILABLE = False
+
 from .config import config
+from .redis_pool import RedisReadyMixin, get_redis, pack_value, unpack_value
 
 logger = logging.getLogger(__name__)
 
-class FileProcessor:
+# Read size used when hashing file-like objects
+HASH_CHUNK_SIZE = 1 << 20  # 1 MB
+
+# Vision payloads - bounded size, re-encoded only on request
+VISION_MAX_SIZE = (1024, 1024)
+VISION_JPEG_QUALITY = 85
+
+# Processed results kept per worker; Redis holds the shared copy
+FILE_CACHE_SIZE = 64
+
+class FileProcessor(RedisReadyMixin):
     def __init__(self):
-        self.processed_files = {}  # In-memory cache
+        self.redis_client = None
+        self.processed_files: LRUCache = LRUCache(maxsize=FILE_CACHE_SIZE)  # Per-worker copy of recent results
+    
+    async def _init_redis(self):
+        """Initialize Redis connection."""
+        try:
+            self.redis_client = get_redis()
+            await self.redis_client.ping()
+            logger.info("File cache Redis connected")
+        except Exception as e:
+            logger.warning(f"File cache Redis unavailable: {e}")
+            self.redis_client = None
+    
+    def _remember(self, file_id: str, result: Dict[str, Any]):
+        """Keep a result in the bounded in-memory cache."""
+        self.processed_files[file_id] = result
+    
+    async def _get_cached(self, file_id: str) -> Optional[Dict[str, Any]]:
+        """Look up a processed file in memory, then Redis."""
+        result = self.processed_files.get(file_id)
+        if result is not None:
+            return result
+        
+        if not self.redis_client:
+            return None
+        try:
+            blob = await self.redis_client.get(f"file:{file_id}")
+        except Exception as e:
+            logger.warning(f"File cache read error: {e}")
+            return None
+        if not blob:
+            return None
+        
+        try:
+            result = msgspec.msgpack.decode(unpack_value(blob))
+        except Exception as e:
+            logger.warning(f"File cache decode error: {e}")
+            return None
+        self._remember(file_id, result)
+        return result
+    
+    async def _set_cached(self, file_id: str, result: Dict[str, Any]):
+        """Cache a processed file in memory and Redis."""
+        self._remember(file_id, result)
+        if not self.redis_client:
+            return
+        try:
+            await self.redis_client.setex(
+                f"file:{file_id}",
+                config.cache_ttl * 24,  # 24 hours
+                pack_value(msgspec.msgpack.encode(result))
+            )
+        except Exception as e:
+            logger.warning(f"File cache write error: {e}")
         
-    def _generate_file_id(self, filename: str, content: bytes) -> str:
-        """Generate unique ID for file."""
-        content_hash = hashlib.md5(content).hexdigest()
-        return f"{filename}_{content_hash[:8]}"
+    def _hash_file(self, file_obj: BinaryIO) -> str:
+        """Full content digest of a file, hashed chunk by chunk."""
+        hasher = blake3.blake3() if BLAKE3_AVAILABLE else hashlib.blake2b()
+        for chunk in iter(lambda: file_obj.read(HASH_CHUNK_SIZE), b""):
+            hasher.update(chunk)
+        file_obj.seek(0)
+        return hasher.hexdigest()
     
-    async def process_pdf(self, file_content: bytes, filename: str) -> Dict[str, Any]:
+    @staticmethod
+    def _collect_pages(pdf_pages) -> Tuple[List[Dict[str, Any]], List[str], bool]:
+        """Extract page texts; returns (pages, text parts, any non-blank text)."""
+        pages = []
+        parts = []
+        has_text = False
+        for i, page in enumerate(pdf_pages, 1):
+            page_text = page.extract_text() or ""
+            stripped = page_text.strip()
+            has_text = has_text or bool(stripped)
+            pages.append({
+                "page": i,
+                "text": stripped
+            })
+            parts.append(f"\n--- Page {i} ---\n{page_text}\n")
+        return pages, parts, has_text
+    
+    async def process_pdf(self, file_obj: BinaryIO, filename: str) -> Dict[str, Any]:
         """Process PDF file and extract text content."""
+        return await asyncio.to_thread(self._process_pdf_sync, file_obj, filename)
+    
+    def _process_pdf_sync(self, file_obj: BinaryIO, filename: str) -> Dict[str, Any]:
+        """Blocking pdf extraction - run in a worker thread."""
         if not PDF_AVAILABLE:
             return {"error": "PDF processing not available", "content": ""}
         
         try:
             # Try pdfplumber first (better for tables/structure)
-            pdf_file = io.BytesIO(file_content)
-            text_content = ""
-            pages = []
+            with pdfplumber.open(file_obj) as pdf:
+                pages, parts, has_text = self._collect_pages(pdf.pages)
             
-            with pdfplumber.open(pdf_file) as pdf:
-                for i, page in enumerate(pdf.pages, 1):
-                    page_text = page.extract_text() or ""
-                    pages.append({
-                        "page": i,
-                        "text": page_text.strip()
-                    })
-                    text_content += f"\\n--- Page {i} ---\\n{page_text}\\n"
+            # Fallback to PyPDF2 if pdfplumber finds no text
+            if not has_text:
+                file_obj.seek(0)
+                pdf_reader = PyPDF2.PdfReader(file_obj)
+                pages, parts, _ = self._collect_pages(pdf_reader.pages)
             
-            # Fallback to PyPDF2 if pdfplumber fails
-            if not text_content.strip():
-                pdf_file.seek(0)
-                pdf_reader = PyPDF2.PdfReader(pdf_file)
-                for i, page in enumerate(pdf_reader.pages, 1):
-                    page_text = page.extract_text() or ""
-                    pages.append({
-                        "page": i, 
-                        "text": page_text.strip()
-                    })
-                    text_content += f"\\n--- Page {i} ---\\n{page_text}\\n"
+            text_content = "".join(parts)
             
             return {
                 "type": "pdf",
@@ -88,14 +178,22 @@ class FileProcessor:
                 "processed_at": datetime.utcnow().isoformat()
             }
     
-    async def process_image(self, file_content: bytes, filename: str) -> Dict[str, Any]:
+    async def process_image(
+        self, file_obj: BinaryIO, filename: str, include_base64: bool = False
+    ) -> Dict[str, Any]:
         """Process image file and extract text/description."""
+        return await asyncio.to_thread(self._process_image_sync, file_obj, filename, include_base64)
+    
+    def _process_image_sync(
+        self, file_obj: BinaryIO, filename: str, include_base64: bool = False
+    ) -> Dict[str, Any]:
+        """Blocking image extraction - run in a worker thread."""
         if not IMAGE_AVAILABLE:
             return {"error": "Image processing not available", "content": ""}
         
         try:
             # Open image
-            image = Image.open(io.BytesIO(file_content))
+            image = Image.open(file_obj)
             
             # Convert to RGB if needed
             if image.mode != 'RGB':
@@ -112,12 +210,7 @@ class FileProcessor:
             width, height = image.size
             format_info = image.format or "Unknown"
             
-            # Create base64 for potential vision model use
-            buffered = io.BytesIO()
-            image.save(buffered, format="JPEG")
-            img_base64 = base64.b64encode(buffered.getvalue()).decode()
-            
-            return {
+            result = {
                 "type": "image",
                 "filename": filename,
                 "content": ocr_text,
@@ -125,10 +218,18 @@ class FileProcessor:
                 "width": width,
                 "height": height,
                 "format": format_info,
-                "base64": img_base64,
                 "processed_at": datetime.utcnow().isoformat()
             }
             
+            # Downscaled JPEG for vision model use - only when asked for
+            if include_base64:
+                image.thumbnail(VISION_MAX_SIZE, Image.Resampling.LANCZOS)
+                buffered = io.BytesIO()
+                image.save(buffered, format="JPEG", quality=VISION_JPEG_QUALITY, optimize=True)
+                result["base64"] = base64.b64encode(buffered.getvalue()).decode()
+            
+            return result
+            
         except Exception as e:
             logger.error(f"Image processing error: {e}")
             return {
@@ -139,29 +240,56 @@ class FileProcessor:
                 "processed_at": datetime.utcnow().isoformat()
             }
     
-    async def process_text_file(self, file_content: bytes, filename: str) -> Dict[str, Any]:
+    @staticmethod
+    def _decode_text(file_content: bytes) -> str:
+        """Decode text - BOM sniffing, UTF-8 fast path, then statistical detection."""
+        # A BOM names the encoding outright - no trial decodes needed
+        head = file_content[:4]
+        if head.startswith(codecs.BOM_UTF8):
+            encoding = 'utf-8-sig'
+        elif head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+            encoding = 'utf-16'
+        else:
+            encoding = 'utf-8'
+        
+        try:
+            return file_content.decode(encoding)
+        except UnicodeDecodeError:
+            pass
+        
+        if CHARSET_DETECTION_AVAILABLE:
+            best = from_bytes(file_content).best()
+            if best is not None:
+                return str(best)
+        
+        # cp1252 covers typical Windows text; latin-1 never fails
+        try:
+            return file_content.decode('cp1252')
+        except UnicodeDecodeError:
+            return file_content.decode('latin-1')
+    
+    async def process_text_file(self, file_obj: BinaryIO, filename: str) -> Dict[str, Any]:
         """Process text file."""
+        return await asyncio.to_thread(self._process_text_file_sync, file_obj, filename)
+    
+    def _process_text_file_sync(self, file_obj: BinaryIO, filename: str) -> Dict[str, Any]:
+        """Blocking text extraction - run in a worker thread."""
         try:
-            # Try different encodings
-            encodings = ['utf-8', 'utf-16', 'latin-1', 'cp1252']
-            text_content = ""
+            file_content = file_obj.read()
             
-            for encoding in encodings:
-                try:
-                    text_content = file_content.decode(encoding)
-                    break
-                except UnicodeDecodeError:
-                    continue
+            text_content = self._decode_text(file_content)
             
-            if not text_content:
-                text_content = file_content.decode('utf-8', errors='ignore')
+            # Count lines without building a list of them
+            line_count = text_content.count("\n")
+            if text_content and not text_content.endswith("\n"):
+                line_count += 1
             
             return {
                 "type": "text",
                 "filename": filename,
                 "content": text_content.strip(),
                 "char_count": len(text_content),
-                "line_count": len(text_content.splitlines()),
+                "line_count": line_count,
                 "processed_at": datetime.utcnow().isoformat()
             }
             
@@ -175,27 +303,42 @@ class FileProcessor:
                 "processed_at": datetime.utcnow().isoformat()
             }
     
-    async def process_file(self, file_content: bytes, filename: str, content_type: str) -> Dict[str, Any]:
-        """Process any file based on type."""
-        file_id = self._generate_file_id(filename, file_content)
+    async def process_file(
+        self, file_obj: BinaryIO, filename: str, content_type: str, include_base64: bool = False
+    ) -> Dict[str, Any]:
+        """Process any file based on type.
+        
+        Accepts a seekable binary file-like object so large uploads can be
+        handed over without materializing them as bytes. Images carry a
+        downscaled base64 JPEG only when include_base64 is set.
+        """
+        # Hashing and extraction block - keep them off the event loop
+        digest = await asyncio.to_thread(self._hash_file, file_obj)
+        file_id = f"{filename}_{digest[:8]}"  # Short ID shown to clients only
         
-        # Check cache first
-        if file_id in self.processed_files:
-            return self.processed_files[file_id]
+        # The cache is shared across users, so it is keyed on the full digest, never the short ID
+        cache_id = f"{filename}_{digest}"
+        if include_base64:
+            cache_id += ":b64"  # Results with and without the vision payload are cached separately
+        
+        # Check cache first - identical uploads are shared
+        cached = await self._get_cached(cache_id)
+        if cached is not None:
+            return cached
         
         # Determine file type
         filename_lower = filename.lower()
         
         if filename_lower.endswith('.pdf') or 'pdf' in content_type:
-            result = await self.process_pdf(file_content, filename)
+            result = await self.process_pdf(file_obj, filename)
         elif filename_lower.endswith(('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tiff')) or 'image' in content_type:
-            result = await self.process_image(file_content, filename)
+            result = await self.process_image(file_obj, filename, include_base64)
         elif filename_lower.endswith(('.txt', '.md', '.csv', '.json', '.xml', '.log')) or 'text' in content_type:
-            result = await self.process_text_file(file_content, filename)
+            result = await self.process_text_file(file_obj, filename)
         else:
             # Try as text first, then give up
             try:
-                result = await self.process_text_file(file_content, filename)
+                result = await self.process_text_file(file_obj, filename)
             except:
                 result = {
                     "type": "unknown",
@@ -205,9 +348,10 @@ class FileProcessor:
                     "processed_at": datetime.utcnow().isoformat()
                 }
         
-        # Add file ID and cache
+        # Add file ID and cache - errors are not cached, so a fixed dependency takes effect
         result["file_id"] = file_id
-        self.processed_files[file_id] = result
+        if not result.get("error"):
+            await self._set_cached(cache_id, result)
         
         return result
     
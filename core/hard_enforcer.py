@@ -1,7 +1,54 @@
 """HARD enforcement - bypass LLM when needed."""
+import functools
 import re
 from typing import Optional
 
+# Exact capability queries - answered with a single set lookup
+CAPABILITY_QUERIES = frozenset({"what can you do?", "what can you do", "capabilities", "help"})
+
+CAPABILITIES_RESPONSE = """I'm your AI Thinking Assistant. I help you:
+
+• **Decide** - Choose between options with clear recommendations
+• **Plan** - Break goals into actionable steps  
+• **Organize** - Prioritize tasks and manage time
+
+**Do this today:** Tell me what you need help with."""
+
+GREETING_RESPONSE = "Hi 👋 Need help deciding, planning, or organizing something?"
+ACK_RESPONSE = "Great! What else can I help you decide, plan, or organize?"
+CLARIFY_RESPONSE = "What specifically do you need help with - deciding between options, planning something, or organizing tasks?"
+DEFAULT_CHAT_RESPONSE = "What would you like help with today - deciding, planning, or organizing?"
+
+# CHAT keywords - single words match whole tokens, phrases match as substrings
+GREETING_WORDS = frozenset({"hi", "hello", "hey", "hii"})
+ACK_WORDS = frozenset({"ok", "okay", "alright", "thanks"})
+ACK_PHRASES = ("thank you",)
+CAPABILITY_WORDS = frozenset({"capabilities", "help"})
+CAPABILITY_PHRASES = ("what can you do",)
+CONFUSED_WORDS = frozenset({"unclear", "confused"})
+CONFUSED_PHRASES = ("don't know", "not sure")
+
+_TOKEN_RE = re.compile(r"[a-z']+")
+
+# CHAT is the catch-all, so long messages land here - only short ones are memoized
+CACHEABLE_MESSAGE_LENGTH = 256
+
+# ORGANIZE task labels in output order, with the keywords that trigger each
+ORGANIZE_TASKS = (
+    ("College work", ("college",)),
+    ("Side hustle", ("side hustle", "business")),
+    ("Family responsibilities", ("family",)),
+    ("Work tasks", ("work",)),
+    ("Gym/fitness", ("gym", "fitness")),
+    ("Health appointments", ("health",)),
+)
+DEFAULT_ORGANIZE_TASKS = ["Task 1", "Task 2", "Task 3"]
+
+# Every keyword occurrence in one scan - the lookahead lets matches overlap
+_ORGANIZE_KEYWORD_RE = re.compile(
+    r"(?=(side hustle|side|college|business|family|work|gym|fitness|health))"
+)
+
 class HardEnforcer:
     """Hard-coded responses and content blocking."""
     
@@ -14,41 +61,51 @@ class HardEnforcer:
             "emotional", "feelings", "therapy", "counseling",
             "support", "journey", "growth", "healing", "peace"
         ]
+        # Single-pass substring scan over all banned words
+        self._banned_re = re.compile("|".join(map(re.escape, self.banned_words)), re.IGNORECASE)
         
         # Student context to inject
         self.student_context = """Assume user is a college student. Deadlines matter. Time is limited. Practical outcomes > theory."""
+        
+        # CHAT replies depend only on the normalized text - memoize short repeats
+        self._chat_reply = functools.lru_cache(maxsize=2048)(self._build_chat_reply)
     
     def handle_chat_mode(self, user_input: str) -> Optional[str]:
         """HARD override for CHAT mode - NO LLM needed."""
         text = user_input.lower().strip()
+        if len(text) <= CACHEABLE_MESSAGE_LENGTH:
+            return self._chat_reply(text)
+        return self._build_chat_reply(text)
+    
+    def _build_chat_reply(self, text: str) -> str:
+        """Pick the canned CHAT reply for normalized input."""
+        # Exact capability queries
+        if text in CAPABILITY_QUERIES:
+            return CAPABILITIES_RESPONSE
+        
+        # Tokenize once so "hi" doesn't fire on "this" or "hit"
+        tokens = set(_TOKEN_RE.findall(text))
         
         # Greeting responses
-        if any(word in text for word in ["hi", "hello", "hey", "hii"]):
-            return "Hi 👋 Need help deciding, planning, or organizing something?"
+        if not tokens.isdisjoint(GREETING_WORDS):
+            return GREETING_RESPONSE
         
-        if any(word in text for word in ["ok", "okay", "alright", "thanks", "thank you"]):
-            return "Great! What else can I help you decide, plan, or organize?"
+        if not tokens.isdisjoint(ACK_WORDS) or any(phrase in text for phrase in ACK_PHRASES):
+            return ACK_RESPONSE
         
-        if "what can you do" in text or "capabilities" in text or "help" in text:
-            return """I'm your AI Thinking Assistant. I help you:
-
-• **Decide** - Choose between options with clear recommendations
-• **Plan** - Break goals into actionable steps  
-• **Organize** - Prioritize tasks and manage time
-
-**Do this today:** Tell me what you need help with."""
+        if not tokens.isdisjoint(CAPABILITY_WORDS) or any(phrase in text for phrase in CAPABILITY_PHRASES):
+            return CAPABILITIES_RESPONSE
         
         # More specific responses instead of just "Batao"
-        if any(word in text for word in ["unclear", "confused", "don't know", "not sure"]):
-            return "What specifically do you need help with - deciding between options, planning something, or organizing tasks?"
+        if not tokens.isdisjoint(CONFUSED_WORDS) or any(phrase in text for phrase in CONFUSED_PHRASES):
+            return CLARIFY_RESPONSE
         
         # Default - be more helpful
-        return "What would you like help with today - deciding, planning, or organizing?"
+        return DEFAULT_CHAT_RESPONSE
     
     def has_banned_content(self, response: str) -> bool:
         """Check if response contains banned advice/therapy words."""
-        response_lower = response.lower()
-        return any(word in response_lower for word in self.banned_words)
+        return self._banned_re.search(response) is not None
     
     def get_student_context(self) -> str:
         """Get student context to inject."""
@@ -57,23 +114,18 @@ class HardEnforcer:
     def fix_organize_response(self, user_input: str) -> str:
         """Hard-coded ORGANIZE response - no advice allowed."""
         # Extract tasks from input (simple keyword matching)
-        tasks = []
-        if "college" in user_input.lower():
-            tasks.append("College work")
-        if "side hustle" in user_input.lower() or "business" in user_input.lower():
-            tasks.append("Side hustle")
-        if "family" in user_input.lower():
-            tasks.append("Family responsibilities")
-        if "work" in user_input.lower() and "side" not in user_input.lower():
-            tasks.append("Work tasks")
-        if "gym" in user_input.lower() or "fitness" in user_input.lower():
-            tasks.append("Gym/fitness")
-        if "health" in user_input.lower():
-            tasks.append("Health appointments")
+        found = set(_ORGANIZE_KEYWORD_RE.findall(user_input.lower()))
+        if "side hustle" in found:
+            found.add("side")
+        # "work" means a job only when no side hustle is mentioned
+        if "side" in found:
+            found.discard("work")
+        
+        tasks = [label for label, keywords in ORGANIZE_TASKS if not found.isdisjoint(keywords)]
         
         # Default tasks if none detected
         if not tasks:
-            tasks = ["Task 1", "Task 2", "Task 3"]
+            tasks = DEFAULT_ORGANIZE_TASKS
         
         # Build response with strict priority logic
         high_task = tasks[0] if tasks else "Most urgent task"
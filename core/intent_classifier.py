@@ -1,9 +1,23 @@
 """Strict rule-based intent classification."""
+import functools
 import re
 from typing import Literal
 
 IntentType = Literal["DECIDE", "PLAN", "ORGANIZE", "CHAT"]
 
+# Keyword fallbacks for messages no pattern matched, checked in order (substring match)
+FALLBACK_KEYWORDS = (
+    ("DECIDE", ("choose", "pick", "better", "decide", "which", "should i", "vs", "or")),
+    ("PLAN", ("plan", "how to", "steps", "build", "create", "achieve", "improve", "prepare", "study", "ready")),
+    ("ORGANIZE", ("organize", "manage", "priority", "tasks", "schedule", "time management")),
+)
+# Only short messages are memoized - repeats are greetings and one-liners, and long ones would pin memory
+CACHEABLE_MESSAGE_LENGTH = 256
+
+_FALLBACK_RES = tuple(
+    (intent, re.compile("|".join(map(re.escape, words)))) for intent, words in FALLBACK_KEYWORDS
+)
+
 class IntentClassifier:
     """Strict rule-based intent classifier - NO LLM fallback."""
     
@@ -76,15 +90,51 @@ class IntentClassifier:
             r"college.*family.*work",
             r"multiple\s+responsibilities"
         ]
+        
+        # Compile once - classify() runs on every message
+        self.decide_patterns = [re.compile(p) for p in self.decide_patterns]
+        self.plan_patterns = [re.compile(p) for p in self.plan_patterns]
+        self.organize_patterns = [re.compile(p) for p in self.organize_patterns]
+        
+        # One union per category - a miss rules out every pattern in a single pass
+        self._decide_any = self._union(self.decide_patterns)
+        self._plan_any = self._union(self.plan_patterns)
+        self._organize_any = self._union(self.organize_patterns)
+        
+        self.chat_patterns = [re.compile(p) for p in (
+            r"^hi$", r"^hello$", r"^hey$", r"^what.*do$", r"^how.*you$",
+            r"^ok$", r"^okay$", r"^thanks$", r"^thank you$"
+        )]
+        
+        # Classification is deterministic in the message - memoize short repeats
+        self._classify_cached = functools.lru_cache(maxsize=4096)(self._classify)
     
     def classify(self, message: str) -> IntentType:
+        """Classify a message, caching only short ones."""
+        if len(message) <= CACHEABLE_MESSAGE_LENGTH:
+            return self._classify_cached(message)
+        return self._classify(message)
+    
+    @staticmethod
+    def _union(patterns) -> "re.Pattern":
+        """Compile an alternation of already-compiled patterns."""
+        return re.compile("|".join(f"(?:{p.pattern})" for p in patterns))
+    
+    @staticmethod
+    def _score(any_pattern: "re.Pattern", patterns, text: str) -> int:
+        """Count matching patterns, skipping the per-pattern scan when none can match."""
+        if not any_pattern.search(text):
+            return 0
+        return sum(1 for pattern in patterns if pattern.search(text))
+    
+    def _classify(self, message: str) -> IntentType:
         """Classify using ONLY rule-based logic - no LLM."""
         message_lower = message.lower().strip()
         
         # Count pattern matches
-        decide_score = sum(1 for pattern in self.decide_patterns if re.search(pattern, message_lower))
-        plan_score = sum(1 for pattern in self.plan_patterns if re.search(pattern, message_lower))
-        organize_score = sum(1 for pattern in self.organize_patterns if re.search(pattern, message_lower))
+        decide_score = self._score(self._decide_any, self.decide_patterns, message_lower)
+        plan_score = self._score(self._plan_any, self.plan_patterns, message_lower)
+        organize_score = self._score(self._organize_any, self.organize_patterns, message_lower)
         
         # Return highest scoring intent
         if decide_score > 0 and decide_score >= plan_score and decide_score >= organize_score:
@@ -95,23 +145,15 @@ class IntentClassifier:
             return "ORGANIZE"
         else:
             # Better CHAT detection - check for common chat patterns
-            chat_patterns = [
-                r"^hi$", r"^hello$", r"^hey$", r"^what.*do$", r"^how.*you$",
-                r"^ok$", r"^okay$", r"^thanks$", r"^thank you$"
-            ]
-            
             # If it's clearly a chat message, return CHAT
-            if any(re.search(pattern, message_lower) for pattern in chat_patterns):
+            if any(pattern.search(message_lower) for pattern in self.chat_patterns):
                 return "CHAT"
             
             # If message contains decision/planning/organizing keywords but didn't match patterns,
             # try to infer intent from keywords
-            if any(word in message_lower for word in ["choose", "pick", "better", "decide", "which", "should i", "vs", "or"]):
-                return "DECIDE"
-            elif any(word in message_lower for word in ["plan", "how to", "steps", "build", "create", "achieve", "improve", "prepare", "study", "ready"]):
-                return "PLAN"
-            elif any(word in message_lower for word in ["organize", "manage", "priority", "tasks", "schedule", "time management"]):
-                return "ORGANIZE"
+            for intent, keywords_re in _FALLBACK_RES:
+                if keywords_re.search(message_lower):
+                    return intent
             
             return "CHAT"
 
@@ -1,62 +1,98 @@
 """Optimized Groq LLM client with caching and fallbacks."""
 import asyncio
 import hashlib
-import json
 import logging
-from typing import Dict, List, Optional, AsyncGenerator
+from typing import Any, Dict, List, Optional, AsyncGenerator
+import msgspec
+from cachetools import TTLCache
 from groq import AsyncGroq
 from tenacity import retry, stop_after_attempt, wait_exponential
-import redis.asyncio as redis
 
 from .config import config
+from .redis_pool import RedisReadyMixin, get_redis, pack_value, unpack_value
 
 logger = logging.getLogger(__name__)
 
-class LLMClient:
+# Long prompts are effectively unique - skip caching them (~8K tokens)
+CACHE_MAX_PROMPT_CHARS = 32_000
+# Sampled outputs shouldn't be replayed from cache
+CACHE_MAX_TEMPERATURE = 0.3
+# Per-worker L1 in front of Redis
+L1_CACHE_SIZE = 256
+L1_MAX_CONTENT_CHARS = 16 * 1024
+
+class LLMResult(msgspec.Struct):
+    """Non-streaming completion - cached as msgpack in exactly this shape."""
+    content: Optional[str]
+    tool_calls: List[Dict[str, Any]] = []
+
+class LLMClient(RedisReadyMixin):
     def __init__(self):
         self.client = AsyncGroq(api_key=config.groq_api_key)
         self.redis_client = None
+        self._key_encoder = msgspec.msgpack.Encoder()
+        self._result_decoder = msgspec.msgpack.Decoder(LLMResult)
+        self._l1: TTLCache = TTLCache(maxsize=L1_CACHE_SIZE, ttl=config.cache_ttl)
     
     async def _init_redis(self):
         """Initialize Redis connection for caching."""
         try:
-            self.redis_client = redis.from_url(config.redis_url)
+            self.redis_client = get_redis()
             await self.redis_client.ping()
             logger.info("Redis cache connected")
         except Exception as e:
             logger.warning(f"Redis unavailable: {e}")
             self.redis_client = None
     
-    def _cache_key(self, messages: List[Dict], tools: Optional[List] = None) -> str:
-        """Generate cache key for request."""
-        content = json.dumps({
-            "messages": messages,
-            "tools": tools or [],
-            "model": config.groq_model,
-            "temperature": config.temperature
-        }, sort_keys=True)
-        return f"llm:{hashlib.md5(content.encode()).hexdigest()}"
+    def _cache_key(self, messages: List[Dict], tools: Optional[List] = None) -> Optional[str]:
+        """Generate cache key for request, or None when it shouldn't be cached."""
+        if config.temperature > CACHE_MAX_TEMPERATURE:
+            return None
+        if sum(len(m.get("content") or "") for m in messages) > CACHE_MAX_PROMPT_CHARS:
+            return None
+        
+        # Positional tuple - deterministic without sorting keys
+        payload = (messages, tools or (), config.groq_model, config.temperature)
+        digest = hashlib.blake2b(self._key_encoder.encode(payload), digest_size=16).hexdigest()
+        return f"llm:{digest}"
+    
+    def _remember(self, cache_key: str, response: LLMResult):
+        """Keep small responses in the in-process cache."""
+        if len(response.content or "") < L1_MAX_CONTENT_CHARS:
+            self._l1[cache_key] = response
     
-    async def _get_cached(self, cache_key: str) -> Optional[Dict]:
-        """Get cached response."""
+    async def _get_cached(self, cache_key: Optional[str]) -> Optional[LLMResult]:
+        """Get cached response from L1, then Redis (refreshing its TTL on a hit)."""
+        if not cache_key:
+            return None
+        cached = self._l1.get(cache_key)
+        if cached is not None:
+            return cached
         if not self.redis_client:
             return None
         try:
-            cached = await self.redis_client.get(cache_key)
-            return json.loads(cached) if cached else None
+            blob = await self.redis_client.getex(cache_key, ex=config.cache_ttl)
+            if not blob:
+                return None
+            cached = self._result_decoder.decode(unpack_value(blob))
+            self._remember(cache_key, cached)
+            return cached
         except Exception as e:
             logger.warning(f"Cache read error: {e}")
             return None
     
-    async def _set_cache(self, cache_key: str, response: Dict):
+    async def _set_cache(self, cache_key: Optional[str], response: LLMResult):
         """Cache response."""
+        if not cache_key:
+            return
+        self._remember(cache_key, response)
         if not self.redis_client:
             return
         try:
             await self.redis_client.setex(
                 cache_key, 
                 config.cache_ttl, 
-                json.dumps(response)
+                pack_value(self._key_encoder.encode(response))
             )
         except Exception as e:
             logger.warning(f"Cache write error: {e}")
@@ -70,14 +106,13 @@ class LLMClient:
         messages: List[Dict], 
         tools: Optional[List] = None,
         stream: bool = False
-    ) -> Dict:
+    ) -> LLMResult:
         """Complete chat with caching and retries."""
-        cache_key = self._cache_key(messages, tools)
-        
         # Check cache first (only for non-streaming)
         if not stream:
+            cache_key = self._cache_key(messages, tools)
             cached = await self._get_cached(cache_key)
-            if cached:
+            if cached is not None:
                 logger.info("Cache hit")
                 return cached
         
@@ -103,10 +138,11 @@ class LLMClient:
             if stream:
                 return response
             
-            # Convert to dict for caching
-            result = {
-                "content": response.choices[0].message.content,
-                "tool_calls": [
+            # Typed result - encoded once for the cache, returned as-is
+            message = response.choices[0].message
+            result = LLMResult(content=message.content)
+            if message.tool_calls:
+                result.tool_calls = [
                     {
                         "id": tc.id,
                         "function": {
@@ -114,9 +150,8 @@ class LLMClient:
                             "arguments": tc.function.arguments
                         }
                     }
-                    for tc in (response.choices[0].message.tool_calls or [])
+                    for tc in message.tool_calls
                 ]
-            }
             
             # Cache non-streaming responses
             await self._set_cache(cache_key, result)
@@ -124,10 +159,10 @@ class LLMClient:
             
         except asyncio.TimeoutError:
             logger.error("LLM timeout")
-            return {"content": "I'm experiencing high load. Please try again.", "tool_calls": []}
+            return LLMResult(content="I'm experiencing high load. Please try again.")
         except Exception as e:
             logger.error(f"LLM error: {e}")
-            return {"content": "I encountered an error. Please rephrase your question.", "tool_calls": []}
+            return LLMResult(content="I encountered an error. Please rephrase your question.")
     
     async def stream_complete(
         self, 
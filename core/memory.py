@@ -1,19 +1,46 @@
 """User-based conversational memory with Redis persistence."""
-import json
 import logging
-from typing import Dict, List, Optional
-from datetime import datetime, timedelta
-import redis.asyncio as redis
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple, Union
+import msgspec
+from cachetools import TTLCache
 
 from .config import config
+from .redis_pool import RedisReadyMixin, get_redis, pack_value, unpack_value
 
 logger = logging.getLogger(__name__)
 
-class ConversationMemory:
+# Bound for the in-memory fallback - least recently written users drop out first
+FALLBACK_MAX_USERS = 10_000
+
+# Most recent messages sent to the LLM as context
+CONTEXT_MESSAGES = 10
+
+class Message(msgspec.Struct):
+    """One stored conversation message."""
+    role: str
+    content: str
+    timestamp: Union[float, str]  # Unix time; ISO string on entries from older releases
+    metadata: Dict[str, Any] = {}
+
+_encoder = msgspec.msgpack.Encoder()
+_decoder = msgspec.msgpack.Decoder(Message)
+_json_decoder = msgspec.json.Decoder(Message)
+
+def _decode_entry(blob: bytes) -> Message:
+    """Decode a list entry - msgpack, with JSON for entries written before the switch."""
+    blob = unpack_value(blob)
+    if blob[:1] == b"{":
+        return _json_decoder.decode(blob)
+    return _decoder.decode(blob)
+
+class ConversationMemory(RedisReadyMixin):
     def __init__(self):
-        self.redis_client = None
+        self.redis_client = None  # Set once by ensure_ready(); None means in-memory only
         self.max_history = 20  # Keep last 20 messages for context
-        self._memory_fallback = {}  # In-memory fallback
+        # In-memory fallback, trimmed and expired like the Redis list
+        self._memory_fallback: TTLCache = TTLCache(maxsize=FALLBACK_MAX_USERS, ttl=config.cache_ttl * 24)
     
     async def _init_redis(self):
         """Initialize Redis for memory persistence."""
@@ -21,7 +48,7 @@ class ConversationMemory:
             return
             
         try:
-            self.redis_client = redis.from_url(config.redis_url)
+            self.redis_client = get_redis()
             await self.redis_client.ping()
             logger.info("Memory storage connected")
         except Exception as e:
@@ -29,64 +56,46 @@ class ConversationMemory:
             self.redis_client = None
     
     def _memory_key(self, user_id: str) -> str:
-        """Generate memory key for user."""
-        return f"memory:user:{user_id}"
+        """Generate memory key for user (a Redis list, one entry per message)."""
+        return f"memory:user:{user_id}:messages"
     
     async def add_message(self, user_id: str, role: str, content: str, metadata: Optional[Dict] = None):
         """Add message to user's conversation history."""
-        message = {
-            "role": role,
-            "content": content,
-            "timestamp": datetime.utcnow().isoformat(),
-            "metadata": metadata or {}
-        }
-        
-        await self._init_redis()
+        await self.add_messages(user_id, [(role, content)], metadata)
+    
+    async def add_messages(self, user_id: str, messages: List[Tuple[str, str]], metadata: Optional[Dict] = None):
+        """Add several (role, content) messages in a single Redis round-trip."""
+        timestamp = time.time()
+        new_messages = [
+            Message(role=role, content=content, timestamp=timestamp, metadata=metadata or {})
+            for role, content in messages
+        ]
         
         try:
-            key = self._memory_key(user_id)
-            
-            # Get existing history
-            history = []
+            # Append, trim and refresh TTL in one pipelined round-trip
             if self.redis_client:
                 try:
-                    history_json = await self.redis_client.get(key)
-                    history = json.loads(history_json) if history_json else []
-                except Exception as e:
-                    logger.warning(f"Redis read error: {e}")
-            
-            # Fallback to in-memory
-            if not history and user_id in self._memory_fallback:
-                history = self._memory_fallback[user_id]
-            
-            # Add new message
-            history.append(message)
-            
-            # Trim to max_history
-            if len(history) > self.max_history:
-                history = history[-self.max_history:]
-            
-            # Save to Redis
-            if self.redis_client:
-                try:
-                    await self.redis_client.setex(
-                        key, 
-                        config.cache_ttl * 24,  # 24 hours for memory
-                        json.dumps(history)
-                    )
+                    key = self._memory_key(user_id)
+                    pipe = self.redis_client.pipeline(transaction=False)
+                    pipe.rpush(key, *(pack_value(_encoder.encode(m)) for m in new_messages))
+                    pipe.ltrim(key, -self.max_history, -1)
+                    pipe.expire(key, config.cache_ttl * 24)  # 24 hours for memory
+                    await pipe.execute()
                 except Exception as e:
                     logger.warning(f"Redis write error: {e}")
             
             # Always save to fallback
-            self._memory_fallback[user_id] = history
+            history = self._memory_fallback.get(user_id)
+            if history is None:
+                history = deque(maxlen=self.max_history)
+            history.extend(new_messages)
+            self._memory_fallback[user_id] = history  # Re-set to refresh the TTL
             
         except Exception as e:
             logger.warning(f"Memory save error: {e}")
     
-    async def get_history(self, user_id: str, limit: Optional[int] = None) -> List[Dict]:
+    async def get_history(self, user_id: str, limit: Optional[int] = None) -> List[Message]:
         """Get user's conversation history."""
-        await self._init_redis()
-        
         try:
             key = self._memory_key(user_id)
             history = []
@@ -94,15 +103,14 @@ class ConversationMemory:
             # Try Redis first
             if self.redis_client:
                 try:
-                    history_json = await self.redis_client.get(key)
-                    if history_json:
-                        history = json.loads(history_json)
+                    entries = await self.redis_client.lrange(key, -(limit or self.max_history), -1)
+                    history = [_decode_entry(entry) for entry in entries]
                 except Exception as e:
                     logger.warning(f"Redis read error: {e}")
             
             # Fallback to in-memory
-            if not history and user_id in self._memory_fallback:
-                history = self._memory_fallback[user_id]
+            if not history:
+                history = list(self._memory_fallback.get(user_id, ()))
             
             if limit:
                 history = history[-limit:]
@@ -114,31 +122,36 @@ class ConversationMemory:
             return []
     
     async def get_context_messages(self, user_id: str) -> List[Dict]:
-        """Get messages formatted for LLM context."""
-        history = await self.get_history(user_id, limit=10)  # Last 10 for context
+        """Get messages formatted for LLM context - one LRANGE, projected in a single pass."""
+        history = ()
+        if self.redis_client:
+            try:
+                entries = await self.redis_client.lrange(self._memory_key(user_id), -CONTEXT_MESSAGES, -1)
+                history = [_decode_entry(entry) for entry in entries]
+            except Exception as e:
+                logger.warning(f"Redis read error: {e}")
         
-        # Convert to LLM format
-        messages = []
-        for msg in history:
-            messages.append({
-                "role": msg["role"],
-                "content": msg["content"]
-            })
+        # Fallback to in-memory
+        if not history:
+            history = list(self._memory_fallback.get(user_id, ()))[-CONTEXT_MESSAGES:]
         
-        return messages
+        return [{"role": msg.role, "content": msg.content} for msg in history]
     
     async def clear_session(self, user_id: str):
         """Clear user's memory."""
-        await self._init_redis()
-        
+        await self.clear_sessions([user_id])
+    
+    async def clear_sessions(self, user_ids: List[str]):
+        """Clear memory for several users with one variadic DEL."""
+        if not user_ids:
+            return
         try:
-            key = self._memory_key(user_id)
             if self.redis_client:
-                await self.redis_client.delete(key)
+                await self.redis_client.delete(*map(self._memory_key, user_ids))
             
             # Clear fallback memory too
-            if user_id in self._memory_fallback:
-                del self._memory_fallback[user_id]
+            for user_id in user_ids:
+                self._memory_fallback.pop(user_id, None)
                 
         except Exception as e:
             logger.warning(f"Memory clear error: {e}")
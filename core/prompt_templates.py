@@ -1,12 +1,7 @@
 """Fixed response templates - STRICT format only."""
+import functools
 
-class ResponseTemplates:
-    """Hard-coded templates that LLM must fill exactly."""
-    
-    @staticmethod
-    def get_decide_template() -> str:
-        """DECIDE template - NO Options section."""
-        return """**Decision:** [state decision in 5 words max]
+DECIDE_TEMPLATE = """**Decision:** [state decision in 5 words max]
 
 **Recommendation:** [Pick EXACTLY ONE option - no "both" or "depends"]
 
@@ -16,10 +11,7 @@ class ResponseTemplates:
 
 **Do this today:** [ONE specific action - max 12 words]"""
 
-    @staticmethod
-    def get_plan_template() -> str:
-        """PLAN template - max 5 steps, student context."""
-        return """**Goal:** [restate goal in 5 words max]
+PLAN_TEMPLATE = """**Goal:** [restate goal in 5 words max]
 
 **Steps:**
 1. [Step 1 - max 8 words]
@@ -30,10 +22,7 @@ class ResponseTemplates:
 
 **Do this today:** [First concrete action - max 12 words]"""
 
-    @staticmethod
-    def get_organize_template() -> str:
-        """ORGANIZE template - priorities only, NO advice."""
-        return """**Tasks:**
+ORGANIZE_TEMPLATE = """**Tasks:**
 • [Task 1]
 • [Task 2]
 • [Task 3]
@@ -45,26 +34,46 @@ class ResponseTemplates:
 
 **Do this today:** [ONE highest priority task - max 12 words]"""
 
+STUDENT_CONTEXT = "User is a college student. Deadlines matter. Time limited. Practical outcomes only."
+BASE_PROMPT = f"{STUDENT_CONTEXT}\n\nBe decisive. Pick ONE option. No advice. No motivation. No health tips."
+
+@functools.lru_cache(maxsize=8)
+def _build_system_prompt(intent: str) -> str:
+    """Assemble the system prompt for an intent - static base first, so the prefix is byte-stable."""
+    if intent == "DECIDE":
+        return f"{BASE_PROMPT}\n\nFill this template EXACTLY:\n{DECIDE_TEMPLATE}\n\nMUST pick ONE recommendation. NO neutral answers. NO Options section."
+
+    elif intent == "PLAN":
+        return f"{BASE_PROMPT}\n\nFill this template EXACTLY:\n{PLAN_TEMPLATE}\n\nMax 5 steps. Be specific. No generic advice."
+
+    elif intent == "ORGANIZE":
+        return f"{BASE_PROMPT}\n\nFill this template EXACTLY:\n{ORGANIZE_TEMPLATE}\n\nPriorities only. NO health advice. NO self-care. NO meditation."
+
+    else:  # CHAT - should not reach here
+        return f"{BASE_PROMPT}\n\nOne sentence only. No planning. No advice."
+
+class ResponseTemplates:
+    """Hard-coded templates that LLM must fill exactly."""
+
+    @staticmethod
+    def get_decide_template() -> str:
+        """DECIDE template - NO Options section."""
+        return DECIDE_TEMPLATE
+
+    @staticmethod
+    def get_plan_template() -> str:
+        """PLAN template - max 5 steps, student context."""
+        return PLAN_TEMPLATE
+
+    @staticmethod
+    def get_organize_template() -> str:
+        """ORGANIZE template - priorities only, NO advice."""
+        return ORGANIZE_TEMPLATE
+
     @staticmethod
     def get_system_prompt(intent: str) -> str:
         """Get system prompt for specific intent."""
-        student_context = "User is a college student. Deadlines matter. Time limited. Practical outcomes only."
-        base = f"{student_context}\n\nBe decisive. Pick ONE option. No advice. No motivation. No health tips."
-        
-        if intent == "DECIDE":
-            template = ResponseTemplates.get_decide_template()
-            return f"{base}\n\nFill this template EXACTLY:\n{template}\n\nMUST pick ONE recommendation. NO neutral answers. NO Options section."
-            
-        elif intent == "PLAN":
-            template = ResponseTemplates.get_plan_template()
-            return f"{base}\n\nFill this template EXACTLY:\n{template}\n\nMax 5 steps. Be specific. No generic advice."
-            
-        elif intent == "ORGANIZE":
-            template = ResponseTemplates.get_organize_template()
-            return f"{base}\n\nFill this template EXACTLY:\n{template}\n\nPriorities only. NO health advice. NO self-care. NO meditation."
-            
-        else:  # CHAT - should not reach here
-            return f"{base}\n\nOne sentence only. No planning. No advice."
+        return _build_system_prompt(intent)
 
 # Global instance
-response_templates = ResponseTemplates()
\ No newline at end of file
+response_templates = ResponseTemplates()
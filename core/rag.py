@@ -1,20 +1,35 @@
 """Fast RAG pipeline with ChromaDB and sentence transformers."""
 import logging
 from typing import List, Dict, Optional
+from cachetools import LRUCache
 import chromadb
 from chromadb.config import Settings
 from sentence_transformers import SentenceTransformer
+import torch
+import numpy as np
 import hashlib
 
 from .config import config
+from .semantic_cache import SemanticCache
 
 logger = logging.getLogger(__name__)
 
+# Documents per embedder forward pass
+EMBED_BATCH_SIZE = 32
+
+# Exact-repeat queries skip the embedder forward pass
+EMBED_CACHE_SIZE = 512
+
+# Per-worker context cache - add_documents clears only its own worker, so keep staleness short
+CONTEXT_CACHE_TTL = 30.0  # seconds
+
 class RAGPipeline:
     def __init__(self):
         self.client = None
         self.collection = None
         self.embedder = None
+        self.query_cache = None
+        self._embedding_cache: LRUCache = LRUCache(maxsize=EMBED_CACHE_SIZE)
         self._init_components()
     
     def _init_components(self):
@@ -34,6 +49,14 @@ class RAGPipeline:
             
             # Initialize fast embedder
             self.embedder = SentenceTransformer(config.embedding_model)
+            if config.embedding_int8:
+                self.embedder = self._quantize(self.embedder)
+            
+            # Near-duplicate queries reuse earlier LLM context
+            self.query_cache = SemanticCache(
+                self.embedder.get_sentence_embedding_dimension(),
+                ttl=CONTEXT_CACHE_TTL
+            )
             
             logger.info("RAG pipeline initialized")
             
@@ -41,27 +64,66 @@ class RAGPipeline:
             logger.error(f"RAG initialization failed: {e}")
             self.client = None
     
+    @staticmethod
+    def _quantize(model: SentenceTransformer) -> SentenceTransformer:
+        """Dynamic int8 quantization of Linear layers for faster CPU inference."""
+        try:
+            quantized = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+            logger.info("Embedder quantized to int8")
+            return quantized
+        except Exception as e:
+            logger.warning(f"Embedder quantization failed, using FP32: {e}")
+            return model
+    
+    def _embed_query(self, query_text: str) -> np.ndarray:
+        """Embed a query, reusing the vector for recently seen text."""
+        key = hashlib.blake2b(query_text.encode(), digest_size=16).digest()
+        vector = self._embedding_cache.get(key)
+        if vector is not None:
+            return vector
+        
+        vector = self.embedder.encode([query_text])[0]
+        self._embedding_cache[key] = vector
+        return vector
+    
     def _generate_id(self, text: str) -> str:
         """Generate unique ID for document."""
         return hashlib.md5(text.encode()).hexdigest()
     
     async def add_document(self, text: str, metadata: Optional[Dict] = None):
         """Add document to knowledge base."""
-        if not self.client:
+        return await self.add_documents([text], [metadata] if metadata else None)
+    
+    async def add_documents(self, texts: List[str], metadatas: Optional[List[Optional[Dict]]] = None):
+        """Add documents to knowledge base, embedding them in batches."""
+        if not self.client or not texts:
             return False
         
         try:
-            doc_id = self._generate_id(text)
-            embedding = self.embedder.encode([text])[0].tolist()
+            # Chroma rejects duplicate IDs in one upsert - last copy wins
+            docs = {}
+            for i, text in enumerate(texts):
+                docs[self._generate_id(text)] = (text, (metadatas[i] if metadatas else None) or {})
+            doc_ids = list(docs)
+            doc_texts = [text for text, _ in docs.values()]
+            
+            embeddings = self.embedder.encode(
+                doc_texts,
+                batch_size=EMBED_BATCH_SIZE,
+                show_progress_bar=False
+            ).tolist()
             
             self.collection.upsert(
-                ids=[doc_id],
-                embeddings=[embedding],
-                documents=[text],
-                metadatas=[metadata or {}]
+                ids=doc_ids,
+                embeddings=embeddings,
+                documents=doc_texts,
+                metadatas=[metadata for _, metadata in docs.values()]
             )
             
-            logger.info(f"Document added: {doc_id[:8]}...")
+            # New documents can change any context (other workers expire theirs via the TTL)
+            self.query_cache.clear()
+            
+            logger.info(f"Documents added: {len(doc_ids)}")
             return True
             
         except Exception as e:
@@ -77,7 +139,7 @@ class RAGPipeline:
         
         try:
             # Generate query embedding
-            query_embedding = self.embedder.encode([query_text])[0].tolist()
+            query_embedding = self._embed_query(query_text).tolist()
             
             # Search
             results = self.collection.query(
@@ -104,6 +166,21 @@ class RAGPipeline:
     
     async def get_context(self, query: str) -> str:
         """Get formatted context for LLM."""
+        if not self.client:
+            return ""
+        
+        # Semantically similar query answered recently - only context text is shared,
+        # never the scored results, which belong to the exact query
+        try:
+            query_vector = self._embed_query(query)
+        except Exception as e:
+            logger.error(f"RAG query error: {e}")
+            return ""
+        cached = self.query_cache.get(query_vector)
+        if cached is not None:
+            logger.info("RAG semantic cache hit")
+            return cached
+        
         results = await self.query(query)
         
         if not results:
@@ -113,7 +190,9 @@ class RAGPipeline:
         for i, result in enumerate(results, 1):
             context_parts.append(f"[Context {i}]: {result['content']}")
         
-        return "\n\n".join(context_parts)
+        context = "\n\n".join(context_parts)
+        self.query_cache.set(query_vector, context)
+        return context
     
     def get_stats(self) -> Dict:
         """Get collection statistics."""
@@ -0,0 +1,67 @@
+"""Shared Redis connection pool for all modules."""
+import asyncio
+from typing import Optional
+
+import redis.asyncio as redis
+
+from .config import config
+
+# Optional compression for large cached values
+try:
+    import zstandard as zstd
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+# One pool per worker process - clients are cheap views over it
+redis_pool = redis.ConnectionPool.from_url(
+    config.redis_url,
+    max_connections=config.redis_max_connections,
+    decode_responses=False
+)
+
+# Values below this size are stored as-is - compression wouldn't pay for itself
+COMPRESS_MIN_BYTES = 1024
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"  # zstd frame header; never a msgpack map/array or JSON prefix
+
+if ZSTD_AVAILABLE:
+    _compressor = zstd.ZstdCompressor(level=3)
+    _decompressor = zstd.ZstdDecompressor()
+
+def get_redis() -> redis.Redis:
+    """Get a client backed by the shared pool."""
+    return redis.Redis(connection_pool=redis_pool)
+
+class RedisReadyMixin:
+    """One-shot ensure_ready() for classes that define their own async _init_redis()."""
+    _redis_ready = False
+    _redis_init_lock: Optional[asyncio.Lock] = None
+    
+    async def ensure_ready(self):
+        """Initialize Redis exactly once - awaited from app startup, even under concurrent first calls."""
+        if self._redis_ready:
+            return
+        if self._redis_init_lock is None:
+            self._redis_init_lock = asyncio.Lock()
+        async with self._redis_init_lock:
+            if not self._redis_ready:
+                await self._init_redis()
+                self._redis_ready = True
+
+def pack_value(blob: bytes) -> bytes:
+    """Compress a serialized value for Redis when it is large enough."""
+    if ZSTD_AVAILABLE and len(blob) >= COMPRESS_MIN_BYTES:
+        return _compressor.compress(blob)
+    return blob
+
+def unpack_value(blob: bytes) -> bytes:
+    """Undo pack_value - uncompressed values pass through unchanged."""
+    if blob[:4] == ZSTD_MAGIC:
+        if not ZSTD_AVAILABLE:
+            raise RuntimeError("Compressed cache value but zstandard is not installed")
+        return _decompressor.decompress(blob)
+    return blob
+
+async def close_redis():
+    """Close all pooled connections."""
+    await redis_pool.disconnect()
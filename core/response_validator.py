@@ -2,31 +2,78 @@
 import re
 from typing import List
 
+# Sentence terminators, and list-item prefixes (bullet or numbered)
+_SENTENCE_END_RE = re.compile(r'[.!?]+')
+_BULLET_RE = re.compile(r'\s*(?:[•\-\*]|\d+\.)\s+')
+
+# BANNED phrases - therapy/advice language
+BANNED_PHRASES = frozenset({
+    "it depends", "remember", "stay motivated", "take a moment",
+    "questions to ask yourself", "consider", "you might want to",
+    "it's important to", "keep in mind", "don't forget",
+    "ultimately", "at the end of the day", "think about",
+    "reflect on", "ask yourself", "take time to", "it's worth",
+    "you may want", "consider whether", "self care", "mental health",
+    "meditation", "breathe", "relax", "wellness", "balance",
+    "emotional", "feelings", "therapy", "mindfulness", "peace"
+})
+
+# BANNED health/advice words
+BANNED_HEALTH_WORDS = frozenset({
+    "meditation", "exercise", "mental health", "self care",
+    "stay motivated", "take care", "mindfulness", "breathe",
+    "relax", "stress", "anxiety", "wellness", "balance",
+    "emotional", "feelings", "therapy", "counseling",
+    "support", "journey", "growth", "healing", "peace"
+})
+
+# One case-insensitive substring scan over phrases and health words
+_BANNED_RE = re.compile(
+    "|".join(map(re.escape, sorted(BANNED_PHRASES | BANNED_HEALTH_WORDS))), re.IGNORECASE
+)
+
 class ResponseValidator:
     """ULTRA-STRICT enforcement - NO exceptions allowed."""
     
-    def __init__(self):
-        # BANNED phrases - therapy/advice language
-        self.banned_phrases = [
-            "it depends", "remember", "stay motivated", "take a moment",
-            "questions to ask yourself", "consider", "you might want to",
-            "it's important to", "keep in mind", "don't forget",
-            "ultimately", "at the end of the day", "think about",
-            "reflect on", "ask yourself", "take time to", "it's worth",
-            "you may want", "consider whether", "self care", "mental health",
-            "meditation", "breathe", "relax", "wellness", "balance",
-            "emotional", "feelings", "therapy", "mindfulness", "peace"
-        ]
-        
-        # BANNED health/advice words
-        self.banned_health_words = [
-            "meditation", "exercise", "mental health", "self care",
-            "stay motivated", "take care", "mindfulness", "breathe",
-            "relax", "stress", "anxiety", "wellness", "balance",
-            "emotional", "feelings", "therapy", "counseling",
-            "support", "journey", "growth", "healing", "peace"
-        ]
+    # Emergency fallback responses - guaranteed clean
+    _FALLBACKS = {
+        "DECIDE": """**Decision:** Need specific options
+
+**Recommendation:** Provide clear choices
+
+**Reason:**
+• Cannot decide without alternatives
+• Need specific options
+
+**Do this today:** List exact options to choose between.""",
+        
+        "PLAN": """**Goal:** Unclear objective
+
+**Steps:**
+1. Define specific goal
+2. Set deadline
+3. List requirements
+4. Create timeline
+5. Start first task
+
+**Do this today:** State exactly what you want to achieve.""",
+        
+        "ORGANIZE": """**Tasks:**
+• Task A
+• Task B
+• Task C
+
+**Priority:**
+• High: Most urgent deadline
+• Medium: Important but flexible
+• Low: Optional items
+
+**Do this today:** Focus on highest priority task.""",
         
+        "CHAT": "Be specific about what you need."
+    }
+    
+    def __init__(self):
         # Strict limits
         self.max_total_words = 80  # MUCH stricter
         self.max_bullets = 3
@@ -59,23 +106,11 @@ class ResponseValidator:
     
     def _has_banned_content(self, text: str) -> bool:
         """Check for ANY banned content."""
-        text_lower = text.lower()
-        
-        # Check banned phrases
-        for phrase in self.banned_phrases:
-            if phrase in text_lower:
-                return True
-        
-        # Check banned health words
-        for word in self.banned_health_words:
-            if word in text_lower:
-                return True
-        
-        return False
+        return _BANNED_RE.search(text) is not None
     
     def _remove_all_questions(self, text: str) -> str:
         """Remove ALL questions - none allowed."""
-        sentences = re.split(r'[.!?]+', text)
+        sentences = _SENTENCE_END_RE.split(text)
         filtered = []
         
         for sentence in sentences:
@@ -101,7 +136,7 @@ class ResponseValidator:
         filtered_lines = []
         
         for line in lines:
-            if re.match(r'^\s*[•\-\*]\s+', line) or re.match(r'^\s*\d+\.\s+', line):
+            if _BULLET_RE.match(line):
                 bullet_count += 1
                 if bullet_count <= self.max_bullets:
                     filtered_lines.append(line)
@@ -144,44 +179,7 @@ class ResponseValidator:
     
     def _get_emergency_fallback(self, intent: str) -> str:
         """Emergency fallback responses - guaranteed clean."""
-        fallbacks = {
-            "DECIDE": """**Decision:** Need specific options
-
-**Recommendation:** Provide clear choices
-
-**Reason:**
-• Cannot decide without alternatives
-• Need specific options
-
-**Do this today:** List exact options to choose between.""",
-            
-            "PLAN": """**Goal:** Unclear objective
-
-**Steps:**
-1. Define specific goal
-2. Set deadline
-3. List requirements
-4. Create timeline
-5. Start first task
-
-**Do this today:** State exactly what you want to achieve.""",
-            
-            "ORGANIZE": """**Tasks:**
-• Task A
-• Task B
-• Task C
-
-**Priority:**
-• High: Most urgent deadline
-• Medium: Important but flexible
-• Low: Optional items
-
-**Do this today:** Focus on highest priority task.""",
-            
-            "CHAT": "Be specific about what you need."
-        }
-        
-        return fallbacks.get(intent, fallbacks["CHAT"])
+        return self._FALLBACKS.get(intent, self._FALLBACKS["CHAT"])
 
 # Global instance
 response_validator = ResponseValidator()
\ No newline at end of file
@@ -0,0 +1,111 @@
+"""Semantic cache for near-duplicate queries using random-projection LSH."""
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+class SemanticCache:
+    """Cache keyed on embeddings - banded random-hyperplane LSH plus a cosine check."""
+
+    def __init__(
+        self,
+        dim: int,
+        n_bands: int = 8,
+        bits_per_band: int = 8,
+        threshold: float = 0.95,
+        ttl: float = 300.0,
+        max_entries: int = 1024,
+        seed: int = 0
+    ):
+        rng = np.random.default_rng(seed)
+        self._planes = rng.standard_normal((dim, n_bands * bits_per_band)).astype(np.float32)
+        self.n_bands = n_bands
+        self.bits_per_band = bits_per_band
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, Tuple[np.ndarray, Hashable, Any, float, List[bytes]]]" = OrderedDict()
+        self._buckets: Dict[bytes, List[int]] = {}
+        self._next_id = 0
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        """Unit-normalize so a dot product is the cosine similarity."""
+        vec = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def _band_keys(self, vec: np.ndarray) -> List[bytes]:
+        """One bucket key per band, prefixed with the band index."""
+        bits = (vec @ self._planes > 0).reshape(self.n_bands, self.bits_per_band)
+        packed = np.packbits(bits, axis=1)
+        return [bytes([band]) + packed[band].tobytes() for band in range(self.n_bands)]
+
+    def get(self, embedding, tag: Hashable = None) -> Optional[Any]:
+        """Get a cached value for a similar embedding stored under the same tag."""
+        vec = self._normalize(embedding)
+        now = time.monotonic()
+        seen = set()
+        expired = []
+        hit = None
+
+        for key in self._band_keys(vec):
+            for entry_id in self._buckets.get(key, ()):
+                if entry_id in seen:
+                    continue
+                seen.add(entry_id)
+
+                entry = self._entries.get(entry_id)
+                if not entry:
+                    continue
+                stored_vec, stored_tag, value, expires_at, _ = entry
+                if expires_at <= now:
+                    expired.append(entry_id)
+                    continue
+                if stored_tag == tag and float(np.dot(stored_vec, vec)) >= self.threshold:
+                    hit = entry_id
+                    break
+            if hit is not None:
+                break
+
+        # Remove after the scan - _remove mutates the bucket lists being iterated
+        for entry_id in expired:
+            self._remove(entry_id)
+
+        if hit is None:
+            return None
+        self._entries.move_to_end(hit)  # Hits stay resident; eviction drops least recently used
+        return self._entries[hit][2]
+
+    def set(self, embedding, value: Any, tag: Hashable = None):
+        """Cache a value for an embedding."""
+        vec = self._normalize(embedding)
+        keys = self._band_keys(vec)
+
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = (vec, tag, value, time.monotonic() + self.ttl, keys)
+        for key in keys:
+            self._buckets.setdefault(key, []).append(entry_id)
+
+        # Evict least recently used entries beyond capacity
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, entry_id: int):
+        """Drop an entry and its bucket references."""
+        entry = self._entries.pop(entry_id, None)
+        if not entry:
+            return
+        for key in entry[4]:
+            bucket = self._buckets.get(key)
+            if bucket:
+                bucket.remove(entry_id)
+                if not bucket:
+                    del self._buckets[key]
+
+    def clear(self):
+        """Drop all cached entries."""
+        self._entries.clear()
+        self._buckets.clear()
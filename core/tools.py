@@ -1,10 +1,13 @@
 """Tool system with async execution and error handling."""
+import ast
 import asyncio
-import json
 import logging
+import math
+import operator
 from typing import Dict, List, Callable, Any, Optional
 from datetime import datetime
 import httpx
+import orjson
 
 # Import competition tools
 try:
@@ -15,10 +18,55 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# Arithmetic the calculator accepts - anything else in the AST is rejected
+_BIN_OPS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Pow: operator.pow,
+}
+_UNARY_OPS = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
+MAX_RESULT_BITS = 4096  # Keeps "9**9**9" and nested powers/products from pinning a CPU
+
+# Outbound HTTP for tools - one pooled client per worker
+HTTP_TIMEOUT = 10.0  # seconds
+HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20)
+
+def _check_result_size(op: ast.operator, left, right):
+    """Reject operations whose result would exceed MAX_RESULT_BITS before computing it."""
+    if isinstance(op, ast.Pow):
+        if right > 0 and abs(left) > 1 and right * math.log2(abs(left)) > MAX_RESULT_BITS:
+            raise ValueError("result too large")
+    elif isinstance(op, ast.Mult) and isinstance(left, int) and isinstance(right, int):
+        if left.bit_length() + right.bit_length() > MAX_RESULT_BITS:
+            raise ValueError("result too large")
+
+def _eval_arithmetic(node: ast.AST):
+    """Evaluate a parsed arithmetic expression without compile/eval."""
+    if isinstance(node, ast.Expression):
+        return _eval_arithmetic(node.body)
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        return node.value
+    if isinstance(node, ast.BinOp) and type(node.op) in _BIN_OPS:
+        left = _eval_arithmetic(node.left)
+        right = _eval_arithmetic(node.right)
+        _check_result_size(node.op, left, right)
+        return _BIN_OPS[type(node.op)](left, right)
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPS:
+        return _UNARY_OPS[type(node.op)](_eval_arithmetic(node.operand))
+    raise ValueError("unsupported expression")
+
 class ToolRegistry:
     def __init__(self):
         self.tools: Dict[str, Dict] = {}
         self.functions: Dict[str, Callable] = {}
+        self._tool_definitions: Optional[List[Dict]] = None  # Built on first use
+        self.http = httpx.AsyncClient(http2=True, limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT)
         self._register_default_tools()
         if CUSTOM_TOOLS_AVAILABLE:
             self._register_custom_tools()
@@ -34,6 +82,7 @@ class ToolRegistry:
             }
         }
         self.functions[name] = func
+        self._tool_definitions = None
         logger.info(f"Tool registered: {name}")
     
     def _register_custom_tools(self):
@@ -48,6 +97,7 @@ class ToolRegistry:
             if func:
                 self.tools[name] = tool_def
                 self.functions[name] = func
+                self._tool_definitions = None
                 logger.info(f"Custom tool registered: {name}")
     
     def _register_default_tools(self):
@@ -96,7 +146,7 @@ class ToolRegistry:
     async def _web_search(self, query: str) -> str:
         """Simple web search (placeholder - integrate with real API)."""
         try:
-            # Placeholder implementation
+            # Placeholder implementation - real calls should go through self.http
             await asyncio.sleep(0.1)  # Simulate API call
             return f"Search results for '{query}': [This is a placeholder. Integrate with real search API for hackathon.]"
         except Exception as e:
@@ -110,7 +160,7 @@ class ToolRegistry:
             if not all(c in allowed_chars for c in expression):
                 return "Invalid characters in expression"
             
-            result = eval(expression)
+            result = _eval_arithmetic(ast.parse(expression, mode="eval"))
             return str(result)
         except Exception as e:
             return f"Calculation error: {e}"
@@ -139,44 +189,46 @@ class ToolRegistry:
             return f"Tool '{name}' failed: {str(e)}"
     
     def get_tool_definitions(self) -> List[Dict]:
-        """Get all tool definitions for LLM."""
-        return list(self.tools.values())
+        """Get all tool definitions for LLM (cached until a tool is registered)."""
+        if self._tool_definitions is None:
+            self._tool_definitions = list(self.tools.values())
+        return self._tool_definitions
     
     async def execute_tool_calls(self, tool_calls: List[Dict]) -> List[Dict]:
         """Execute multiple tool calls concurrently."""
         if not tool_calls:
             return []
         
-        # Execute all tools concurrently
+        # Schedule each tool as soon as its arguments are parsed
         tasks = []
         for tool_call in tool_calls:
             func_name = tool_call["function"]["name"]
             try:
-                arguments = json.loads(tool_call["function"]["arguments"])
-            except json.JSONDecodeError:
+                arguments = orjson.loads(tool_call["function"]["arguments"])
+            except orjson.JSONDecodeError:
                 arguments = {}
             
-            task = self.execute_tool(func_name, arguments)
+            task = asyncio.create_task(self.execute_tool(func_name, arguments))
             tasks.append((tool_call["id"], task))
         
-        # Wait for all results
+        # Wait for all results - together, not one after another
+        outputs = await asyncio.gather(*(task for _, task in tasks), return_exceptions=True)
+        
         results = []
-        for tool_id, task in tasks:
-            try:
-                result = await task
-                results.append({
-                    "tool_call_id": tool_id,
-                    "role": "tool",
-                    "content": result
-                })
-            except Exception as e:
-                results.append({
-                    "tool_call_id": tool_id,
-                    "role": "tool",
-                    "content": f"Execution failed: {e}"
-                })
+        for (tool_id, _), output in zip(tasks, outputs):
+            if isinstance(output, BaseException):
+                output = f"Execution failed: {output}"
+            results.append({
+                "tool_call_id": tool_id,
+                "role": "tool",
+                "content": output
+            })
         
         return results
 
+    async def aclose(self):
+        """Close pooled HTTP connections."""
+        await self.http.aclose()
+
 # Global instance
 tools = ToolRegistry()
\ No newline at end of file
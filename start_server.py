@@ -2,6 +2,8 @@
 """Simple server starter script."""
 import uvicorn
 
+from core.config import config
+
 if __name__ == "__main__":
     print("🚀 Starting AI Assistant API Server...")
     print("   API Server: http://localhost:8000")
@@ -9,10 +11,14 @@ if __name__ == "__main__":
     print("   React Frontend: cd frontend && npm start")
     print("   Press Ctrl+C to stop")
     
+    # reload forces a single worker - only enable it via DEBUG in development
     uvicorn.run(
         "api.main:app",
         host="0.0.0.0",
         port=8000,
-        reload=True,
-        log_level="info"
+        workers=config.web_concurrency,
+        loop="uvloop",
+        http="httptools",
+        reload=config.debug,
+        log_level=config.log_level.lower()
     )
\ No newline at end of file